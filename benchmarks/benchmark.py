@@ -0,0 +1,391 @@
+""" Performance benchmarks for pymixconsole.
+
+Times every processor and component across block sizes with mono and stereo
+inputs, and full consoles across channel counts (construction time, first call
+including numba compilation, and steady-state real-time factor).
+
+Run all benchmarks and store the results
+    python benchmarks/benchmark.py --output results.json
+
+Compare against a stored baseline (exits with 1 if anything got slower than the threshold)
+    python benchmarks/benchmark.py --output results.json --baseline baseline.json --threshold 1.25
+
+The precision benchmark renders the same randomized console in float64 and float32
+and exits with 1 if the float32 output deviates by more than --max-float32-error dB
+(relative to the peak of the float64 output).
+
+The routing benchmark times the send mixdown of the busses and the master with the cached 
+routing matrix of a console against summing the weighted inputs of each bus on its own.
+
+The batch benchmark compares a `BatchConsole` with processing the same consoles one
+after another, reporting the time per console and block for both.
+
+The startup benchmark times a fresh process importing pymixconsole, running
+`pymc.warmup()` (compiling or loading the cached kernels) and processing its first
+block, as a short-lived batch worker would. It also times the import of the
+package, of the core processors alone and of the console in fresh processes, and
+exits with 1 if any of them exceeds its budget in IMPORT_BUDGETS (scaled by --import-budget-scale).
+
+"""
+import os
+import sys
+import json
+import time
+import random
+import inspect
+import itertools
+import argparse
+import platform
+import subprocess
+import warnings
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import pymixconsole as pymc
+from pymixconsole import processors
+from pymixconsole.components.comb import Comb
+from pymixconsole.components.allpass import Allpass
+from pymixconsole.components.iirfilter import IIRfilter
+
+SAMPLE_RATE    = 44100
+BLOCK_SIZES    = [64, 256, 512, 2048]
+CHANNEL_COUNTS = [1, 8, 32, 64]
+ENGINES        = ["channel", "vectorized"]
+
+# import time budgets in seconds (importing the package alone must not load any dependencies,
+# and the processors must not load numba or scipy, see tests/test_imports.py)
+IMPORT_BUDGETS = {"import pymixconsole"                                         : 0.05,
+                  "from pymixconsole.processors import Gain, Equaliser, Panner" : 0.5,
+                  "import pymixconsole as pymc; pymc.Console"                   : 1.5}
+
+def time_calls(fn, min_time=0.2, max_calls=10000):
+    """ Return the first call time and the mean steady-state time per call in seconds. """
+    start = time.perf_counter()
+    fn()
+    first_call = time.perf_counter() - start
+
+    calls = 0
+    start = time.perf_counter()
+    while calls < max_calls:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+
+    return first_call, elapsed / calls
+
+def result(name, block_size, first_call, per_block, **kwargs):
+    return {"name"            : name,
+            "block_size"      : block_size,
+            "first_call_s"    : first_call,
+            "per_block_us"    : per_block * 1e6,
+            "realtime_factor" : (block_size / SAMPLE_RATE) / per_block,
+            **kwargs}
+
+def get_processor_classes():
+    return [cls for name, cls in inspect.getmembers(processors, inspect.isclass) if issubclass(cls, pymc.processor.Processor)]
+
+def benchmark_processors(block_sizes, min_time):
+    results = []
+    rng = np.random.RandomState(0)
+
+    for cls in get_processor_classes():
+        for block_size in block_sizes:
+            for layout, shape in [("mono", (block_size,)), ("stereo", (block_size, 2))]:
+                x = rng.rand(*shape) * 2 - 1
+                name = f"processor/{cls.__name__}/{layout}"
+                try:
+                    processor = cls(block_size=block_size, sample_rate=SAMPLE_RATE)
+                    processor.randomize()
+                    first_call, per_block = time_calls(lambda: processor.process(x.copy()), min_time=min_time)
+                    results.append(result(name, block_size, first_call, per_block))
+                except Exception as e:
+                    results.append({"name" : name, "block_size" : block_size, "error" : repr(e)})
+
+    return results
+
+def benchmark_components(block_sizes, min_time):
+    results = []
+    rng = np.random.RandomState(0)
+
+    for block_size in block_sizes:
+        x = rng.rand(block_size) * 2 - 1
+        x2 = rng.rand(block_size, 2) * 2 - 1
+
+        comb = Comb(1116, 0.2, 0.84, block_size)
+        first_call, per_block = time_calls(lambda: comb.process(x.copy()), min_time=min_time)
+        results.append(result("component/Comb/mono", block_size, first_call, per_block))
+
+        allpass = Allpass(556, 0.5, block_size)
+        first_call, per_block = time_calls(lambda: allpass.process(x.copy()), min_time=min_time)
+        results.append(result("component/Allpass/mono", block_size, first_call, per_block))
+
+        iirfilter = IIRfilter(6.0, 0.7, 1000.0, SAMPLE_RATE, "peaking", n_channels=2)
+        first_call, per_block = time_calls(lambda: iirfilter.apply_filter(x2), min_time=min_time)
+        results.append(result("component/IIRfilter/stereo", block_size, first_call, per_block))
+
+    return results
+
+def benchmark_consoles(channel_counts, engines, min_time, block_size=512, thread_counts=[1]):
+    results = []
+    rng = np.random.RandomState(0)
+
+    for engine, num_channels, num_threads in itertools.product(engines, channel_counts, thread_counts):
+        np.random.seed(0)
+        random.seed(0)
+
+        start = time.perf_counter()
+        console = pymc.Console(block_size=block_size, sample_rate=SAMPLE_RATE, num_channels=num_channels,
+                               engine=engine, num_threads=num_threads)
+        construction = time.perf_counter() - start
+
+        console.randomize()
+        console.busses[0].processors.get("delay").parameters.bypass.value = False
+        console.busses[1].processors.get("reverb").parameters.wet_mix.value = 1.0
+
+        x = rng.rand(block_size, num_channels) * 2 - 1
+        out = np.empty((block_size, 2))
+        first_call, per_block = time_calls(lambda: console.process_block(x, out=out), min_time=min_time)
+
+        name = f"console/{engine}/{num_channels}ch" + (f"/{num_threads}threads" if num_threads > 1 else "")
+        results.append(result(name, block_size, first_call, per_block, construction_s=construction))
+
+    return results
+
+def benchmark_batch(batch_sizes, min_time, block_size=512, num_channels=8):
+    """ Time a `BatchConsole` against processing the same consoles one after another (per console). """
+    results = []
+    x = np.random.RandomState(0).rand(block_size, num_channels) * 2 - 1
+
+    for batch_size in batch_sizes:
+        np.random.seed(0)
+        random.seed(0)
+        batch = pymc.BatchConsole(pymc.Console(block_size=block_size, sample_rate=SAMPLE_RATE, num_channels=num_channels),
+                                  batch_size=batch_size)
+        batch.randomize()
+        consoles = [console.clone() for console in batch.consoles]
+
+        out = np.empty((batch_size, block_size, 2))
+        first_call, per_block = time_calls(lambda: batch.process_block(x, out=out), min_time=min_time)
+        results.append(result(f"batch/{num_channels}ch/{batch_size}consoles", block_size, first_call, per_block / batch_size))
+
+        def process_separately():
+            for console in consoles:
+                console.process_block(x, out=out[0])
+        first_call, per_block = time_calls(process_separately, min_time=min_time)
+        results.append(result(f"batch/{num_channels}ch/{batch_size}separate", block_size, first_call, per_block / batch_size))
+
+    return results
+
+def benchmark_routing(channel_counts, min_time, block_size=512):
+    """ Time the send mixdown of a console with the routing matrix against mixing each bus on its own. """
+    results = []
+    rng = np.random.RandomState(0)
+
+    for num_channels in channel_counts:
+        np.random.seed(0)
+        random.seed(0)
+        console = pymc.Console(block_size=block_size, sample_rate=SAMPLE_RATE, num_channels=num_channels)
+        console.randomize()
+
+        mix_buffer = console._get_mix_buffer(block_size)
+        mix_buffer[:num_channels] = rng.rand(num_channels, block_size, 2) * 2 - 1
+        out = np.empty((block_size, 2))
+
+        def mix_matrix():
+            console._mix_busses(mix_buffer)
+            console._mix(console.routing_matrix[console.num_busses:], console._get_routing()[1][1],
+                         mix_buffer.reshape(mix_buffer.shape[0], -1), None, out.reshape(1, -1))
+        first_call, per_block = time_calls(mix_matrix, min_time=min_time)
+        results.append(result(f"routing/{num_channels}ch/matrix", block_size, first_call, per_block))
+
+        def mix_busses():
+            for bus_idx, bus in enumerate(console.busses):
+                mix_buffer[num_channels+bus_idx] = np.sum(mix_buffer[:num_channels] * bus.gains[:,None,None], axis=0)
+            out[...] = np.sum(mix_buffer * console.master.gains[:,None,None], axis=0)
+        first_call, per_block = time_calls(mix_busses, min_time=min_time)
+        results.append(result(f"routing/{num_channels}ch/per-bus", block_size, first_call, per_block))
+
+    return results
+
+def benchmark_precision(channel_counts, engines, min_time, block_size=512, num_blocks=200):
+    results = []
+    rng = np.random.RandomState(0)
+
+    for engine in engines:
+        for num_channels in channel_counts:
+            x = (rng.rand(block_size * num_blocks, num_channels) * 2 - 1) * 0.5
+            outputs = {}
+
+            for dtype in ["float64", "float32"]:
+                np.random.seed(0)
+                random.seed(0)
+                console = pymc.Console(block_size=block_size, sample_rate=SAMPLE_RATE, num_channels=num_channels,
+                                       engine=engine, dtype=dtype)
+                console.randomize()
+                console.busses[0].processors.get("delay").parameters.bypass.value = False
+
+                outputs[dtype] = np.concatenate([console.process_block(x[i*block_size:(i+1)*block_size]).copy() 
+                                                 for i in range(num_blocks)])
+
+                block = x[:block_size].astype(dtype)
+                out = np.empty((block_size, 2), dtype=dtype)
+                first_call, per_block = time_calls(lambda: console.process_block(block, out=out), min_time=min_time)
+                results.append(result(f"precision/{engine}/{dtype}/{num_channels}ch", block_size, first_call, per_block))
+
+            reference = outputs["float64"]
+            error = np.max(np.abs(reference - outputs["float32"])) / np.max(np.abs(reference))
+            results[-1]["error_db"] = float(20 * np.log10(max(error, 1e-20)))
+
+    return results
+
+STARTUP_SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+import numpy as np
+import pymixconsole as pymc
+imported = time.perf_counter()
+warmup = pymc.warmup()
+console = pymc.Console(block_size=512, sample_rate=44100, num_channels=8)
+console.randomize()
+start_block = time.perf_counter()
+console.process_block(np.random.rand(512, 8) - 0.5)
+print(json.dumps({"import_s" : imported - start, "warmup_s" : warmup,
+                  "first_block_s" : time.perf_counter() - start_block,
+                  "recompilations" : len(pymc.recompilations())}))
+"""
+
+def benchmark_startup(num_runs=2):
+    """ Time fresh processes (the first run may compile, later ones load the kernel cache). """
+    results = []
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+    for run in range(num_runs):
+        output = subprocess.run([sys.executable, "-W", "ignore", "-c", STARTUP_SCRIPT], cwd=root,
+                                capture_output=True, text=True, check=True).stdout
+        startup = json.loads(output.strip().splitlines()[-1])
+        total = startup["import_s"] + startup["warmup_s"] + startup["first_block_s"]
+        results.append({"name" : f"startup/run{run}", "block_size" : 512,
+                        "per_block_us" : total * 1e6, "realtime_factor" : (512 / SAMPLE_RATE) / total,
+                        **startup})
+
+    return results
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+{statement}
+print(time.perf_counter() - start)
+"""
+
+def benchmark_imports(num_runs=3):
+    """ Time the imports in IMPORT_BUDGETS in fresh processes (taking the fastest run). """
+    results = []
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+    for statement, budget in IMPORT_BUDGETS.items():
+        times = []
+        for run in range(num_runs):
+            output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(statement=statement)], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout
+            times.append(float(output.strip().splitlines()[-1]))
+        results.append({"name" : f"import/{statement}", "block_size" : 0,
+                        "import_s" : min(times), "budget_s" : budget})
+
+    return results
+
+def compare(results, baseline, threshold):
+    """ Print the change of each benchmark against the baseline and return the regressions. """
+    reference = {(r["name"], r["block_size"]) : r for r in baseline["results"] if "per_block_us" in r}
+    regressions = []
+
+    for r in results["results"]:
+        key = (r["name"], r["block_size"])
+        if "per_block_us" not in r or key not in reference:
+            continue
+        ratio = r["per_block_us"] / reference[key]["per_block_us"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"{r['name']:<45} {r['block_size']:>5} {reference[key]['per_block_us']:>12.1f} us {r['per_block_us']:>12.1f} us {ratio:>6.2f}x {flag}")
+        if ratio > threshold:
+            regressions.append(r)
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="pymixconsole performance benchmarks")
+    parser.add_argument("--output",    type=str, default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline",  type=str, default=None, help="JSON file of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as a regression")
+    parser.add_argument("--min-time",  type=float, default=0.2, help="minimum timing duration per benchmark in seconds")
+    parser.add_argument("--only",      type=str, nargs="+", default=["processors", "components", "consoles", "routing", "precision", "batch", "startup"],
+                                       choices=["processors", "components", "consoles", "routing", "precision", "batch", "startup"])
+    parser.add_argument("--max-float32-error", type=float, default=-80.0, help="largest float32 deviation from float64 in dB")
+    parser.add_argument("--import-budget-scale", type=float, default=1.0, help="scale the import time budgets (e.g. for slow machines)")
+    parser.add_argument("--block-sizes",    type=int, nargs="+", default=BLOCK_SIZES)
+    parser.add_argument("--channel-counts", type=int, nargs="+", default=CHANNEL_COUNTS)
+    parser.add_argument("--batch-sizes",    type=int, nargs="+", default=[1, 8, 32], help="consoles per BatchConsole")
+    parser.add_argument("--thread-counts",  type=int, nargs="+", default=[1], help="console thread pool sizes")
+    args = parser.parse_args()
+
+    warnings.simplefilter("ignore")
+
+    results = {"platform" : {"python"    : platform.python_version(),
+                             "machine"   : platform.machine(),
+                             "processor" : platform.processor(),
+                             "numpy"     : np.__version__},
+               "results"  : []}
+
+    if "processors" in args.only:
+        results["results"] += benchmark_processors(args.block_sizes, args.min_time)
+    if "components" in args.only:
+        results["results"] += benchmark_components(args.block_sizes, args.min_time)
+    if "consoles" in args.only:
+        results["results"] += benchmark_consoles(args.channel_counts, ENGINES, args.min_time, thread_counts=args.thread_counts)
+    if "routing" in args.only:
+        results["results"] += benchmark_routing(sorted(set(args.channel_counts + [128])), args.min_time)
+    if "precision" in args.only:
+        results["results"] += benchmark_precision(args.channel_counts, ENGINES, args.min_time)
+    if "batch" in args.only:
+        results["results"] += benchmark_batch(args.batch_sizes, args.min_time)
+    if "startup" in args.only:
+        results["results"] += benchmark_startup()
+        results["results"] += benchmark_imports()
+
+    for r in results["results"]:
+        if "budget_s" in r:
+            print(f"{r['name']:<60} {r['import_s']*1e3:>8.1f} ms (budget {r['budget_s']*args.import_budget_scale*1e3:0.0f} ms)")
+        elif "error" in r:
+            print(f"{r['name']:<45} {r['block_size']:>5} error: {r['error']}")
+        else:
+            print(f"{r['name']:<45} {r['block_size']:>5} {r['per_block_us']:>12.1f} us {r['realtime_factor']:>10.1f}x real-time"
+                  + (f" {r['error_db']:>8.1f} dB error" if "error_db" in r else "")
+                  + (f" (import {r['import_s']:0.2f} s, warm-up {r['warmup_s']:0.2f} s, first block {r['first_block_s']*1e3:0.1f} ms,"
+                     f" {r['recompilations']} recompilations)" if "warmup_s" in r else ""))
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    failed = [r for r in results["results"] if r.get("error_db", -np.inf) > args.max_float32_error]
+    for r in failed:
+        print(f"{r['name']} float32 output deviates by {r['error_db']:0.1f} dB (limit {args.max_float32_error:0.1f} dB)")
+
+    over_budget = [r for r in results["results"] if r.get("import_s", 0) > r.get("budget_s", np.inf) * args.import_budget_scale]
+    for r in over_budget:
+        print(f"{r['name']} took {r['import_s']:0.3f} s (budget {r['budget_s'] * args.import_budget_scale:0.3f} s)")
+
+    if args.baseline:
+        with open(args.baseline, "r") as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline, args.threshold)
+        if len(regressions) > 0:
+            print(f"{len(regressions)} benchmarks are slower than the baseline by more than {args.threshold}x")
+            sys.exit(1)
+
+    if len(failed) > 0 or len(over_budget) > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,28 @@
 """Top-level module for pymixconsole"""
+import importlib
 
-# Import pymixconsole sub-modules
-from .console import Console
-from .channel import Channel
-from .multitrack import Multitrack
\ No newline at end of file
+# sub-modules and their classes are imported on first access, so that importing a
+# single processor (e.g. `from pymixconsole.processors import Gain`) stays cheap
+_attributes = {"Console"        : "console",
+               "BatchConsole"   : "batch_console",
+               "Channel"        : "channel",
+               "Multitrack"     : "multitrack",
+               "warmup"         : "compilation",
+               "recompilations" : "compilation"}
+
+_submodules = ["automation", "batch_console", "bus", "channel", "compilation", "components", "console", "dataset",
+               "multitrack", "parameter", "parameter_list", "parameter_store", "processor",
+               "processor_list", "processors", "util"]
+
+__all__ = list(_attributes)
+
+def __getattr__(name):
+    if name in _attributes:
+        globals()[name] = getattr(importlib.import_module(f".{_attributes[name]}", __name__), name)
+        return globals()[name]
+    elif name in _submodules:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def __dir__():
+    return sorted(list(globals()) + __all__ + _submodules)
@@ -0,0 +1,100 @@
+import numpy as np
+
+INTERPOLATIONS = ["linear", "step"]
+
+class AutomationLane():
+    """ Breakpoint curve that automates one parameter of a processor.
+
+    The curve passes through the values at the given times (in seconds) and holds
+    the first and last value before and after the breakpoints. Float and int
+    parameters are linearly interpolated by default, while string and bool
+    parameters always step to the value of the previous breakpoint.
+
+    processor (Processor): Processor that owns the parameter
+    parameter_name (str): Name of the automated parameter
+    times (list): Breakpoint times in seconds (increasing)
+    values (list): Parameter value at each breakpoint
+    interpolation (str): "linear" or "step" (defaults to "linear" for float and int parameters)
+
+    """
+    def __init__(self, processor, parameter_name, times, values, interpolation=None):
+
+        self.processor = processor
+        self.parameter = getattr(processor.parameters, parameter_name)
+        self.parameter_name = parameter_name
+
+        if len(times) != len(values) or len(times) < 1:
+            raise ValueError("Automation lanes need the same number (at least one) of times and values.")
+        if np.any(np.diff(times) < 0):
+            raise ValueError("Automation breakpoint times must be increasing.")
+
+        for value in values:
+            self.parameter.check_value(value)
+
+        if interpolation is None:
+            interpolation = "linear" if self.parameter.kind in ["float", "int"] else "step"
+        if interpolation not in INTERPOLATIONS:
+            raise ValueError(f"Invalid interpolation {interpolation}. Must be one of {INTERPOLATIONS}.")
+        if interpolation == "linear" and self.parameter.kind not in ["float", "int"]:
+            raise ValueError(f"Parameter {parameter_name} of kind '{self.parameter.kind}' can only use 'step' interpolation.")
+
+        self.times = np.array(times, dtype=np.float64)
+        self.values = np.array(values, dtype=np.float64 if self.parameter.kind in ["float", "int"] else object)
+        self.interpolation = interpolation
+
+    def evaluate(self, position, num_samples, sample_rate):
+        """ Return the value of the curve at each of `num_samples` samples starting at sample `position`. """
+        t = (position + np.arange(num_samples)) / sample_rate
+
+        if self.interpolation == "linear":
+            values = np.interp(t, self.times, self.values)
+        else:
+            idx = np.searchsorted(self.times, t, side="right") - 1
+            values = self.values[np.maximum(idx, 0)]
+
+        if self.parameter.kind == "int":
+            values = np.rint(values).astype(np.int64)
+
+        return values
+
+class Automation():
+    """ Collection of automation lanes evaluated by the console for every block. """
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.lanes = []
+
+    def add(self, processor, parameter_name, times, values, interpolation=None):
+        lane = AutomationLane(processor, parameter_name, times, values, interpolation=interpolation)
+        self.lanes = [l for l in self.lanes if not (l.processor is processor and l.parameter_name == parameter_name)]
+        self.lanes.append(lane)
+        return lane
+
+    def remove(self, processor, parameter_name):
+        self.lanes = [l for l in self.lanes if not (l.processor is processor and l.parameter_name == parameter_name)]
+
+    def clear(self):
+        self.lanes = []
+
+    def clone(self, processors):
+        """ Return a copy with the lanes moved to other processors (a dict from `id()` of each original processor). """
+        automation = Automation(self.sample_rate)
+        for lane in self.lanes:
+            automation.add(processors[id(lane.processor)], lane.parameter_name, lane.times, lane.values, lane.interpolation)
+        return automation
+
+    def apply(self, position, num_samples):
+        """ Evaluate all lanes for the next block and pass the curves to their processors.
+
+        Lanes that are constant over the block simply set the parameter value (updating the
+        processor only if it changed), so there is no extra cost outside of the ramps.
+
+        """
+        for lane in self.lanes:
+            values = lane.evaluate(position, num_samples, self.sample_rate)
+            if np.all(values == values[0]):
+                value = values[0].item() if isinstance(values[0], np.generic) else values[0]
+                if lane.parameter.value != value:
+                    lane.parameter.value = value
+            else:
+                lane.processor.automate(lane.parameter_name, values)
@@ -0,0 +1,311 @@
+import numpy as np
+
+from .console import Console
+from .channel import Channel
+from .processor import SILENCE_THRESHOLD
+
+class BatchConsole:
+    """ A batch of consoles that mix the same tracks with different parameters at once.
+
+    Each console in the batch has its own parameters, processor order, automation and
+    DSP state, but every block of the tracks is read once and processed through all
+    of them together. The channels of all consoles are processed as one large set of
+    channels with the vectorized engine (see `Channel.process_batch()`), so each stage
+    of the channel chains runs once for the whole batch, the sends of all consoles are
+    mixed with a single matrix product, and the bus and master processors are batched
+    in the same way. This amortizes the Python overhead of a console over the batch,
+    which is useful to render many randomized mixes of a multitrack for a dataset.
+
+    The output of each console matches processing the block with that console on its own.
+
+    consoles (Console or list): A prototype console that is cloned `batch_size` times,
+                                or a list of consoles with the same layout and settings
+    batch_size (int): Number of consoles when cloning a prototype
+    kwargs: Arguments to create the prototype `Console` if none is given
+
+    Example rendering 16 random mixes of a multitrack
+    >>> batch = BatchConsole(Console(multitrack=multitrack), batch_size=16)
+    >>> batch.randomize()
+    >>> mixes = batch.render(multitrack)
+
+    """
+
+    def __init__(self, consoles=None, batch_size=1, **kwargs):
+
+        if consoles is None:
+            consoles = Console(**kwargs)
+        elif len(kwargs) > 0:
+            raise ValueError("Pass either consoles or the arguments to create a console, not both.")
+
+        if isinstance(consoles, Console):
+            self.consoles = [consoles.clone() for _ in range(batch_size)]
+        else:
+            self.consoles = list(consoles)
+
+        if len(self.consoles) == 0:
+            raise ValueError("A batch needs at least one console.")
+
+        prototype = self.consoles[0]
+        for console in self.consoles:
+            if ((console.num_channels, console.num_busses, console.block_size, console.sample_rate, console.dtype) !=
+                (prototype.num_channels, prototype.num_busses, prototype.block_size, prototype.sample_rate, prototype.dtype)):
+                raise ValueError("All consoles in a batch must have the same channels, busses, block size, sample rate and dtype.")
+
+        self.num_channels = prototype.num_channels
+        self.num_busses   = prototype.num_busses
+        self.block_size   = prototype.block_size
+        self.sample_rate  = prototype.sample_rate
+        self.dtype        = prototype.dtype
+        self.skip_silence = prototype.skip_silence
+
+        # preallocate the work buffer used by process_block()
+        self._mix_buffer = None
+        self._get_mix_buffer(self.block_size)
+
+    def __len__(self):
+        return len(self.consoles)
+
+    def __getitem__(self, idx):
+        return self.consoles[idx]
+
+    @property
+    def batch_size(self):
+        return len(self.consoles)
+
+    @property
+    def position(self):
+        return self.consoles[0].position
+
+    def process_block(self, block, out=None):
+        """ Process a block of the tracks through every console of the batch.
+
+        The input block has dimensions [samples, in_channels] (all inputs are mono)
+        and the output has dimensions [consoles, samples, 2]. If `out` is given
+        the output is written into it and returned.
+
+        """
+        if block.ndim == 1:
+            block = np.expand_dims(block, -1)
+        block = block.astype(self.dtype, copy=False)
+        num_samples, num_block_channels = block.shape
+
+        K = self.batch_size
+        C = self.num_channels
+        B = self.num_busses
+
+        if out is None:
+            out = np.empty((K, num_samples, 2), dtype=self.dtype)
+
+        # evaluate the automation curves for this block
+        for console in self.consoles:
+            console.automation.apply(console.position, num_samples)
+            console.position += num_samples
+
+        # buffer with the output of each channel followed by each bus for every console
+        mix_buffer = self._get_mix_buffer(num_samples)
+        mix_buffer[:,num_block_channels:C] = 0.0
+
+        # skip the channels with a silent input whose processors are idle
+        silent = self._skip_silent_channels(block, mix_buffer) if self.skip_silence else None
+
+        # apply channel processing to the channels of all consoles at once
+        active = np.ones((K, num_block_channels), dtype=bool) if silent is None else ~silent[:,:num_block_channels]
+        console_idxs, ch_idxs = np.nonzero(active)
+        if len(ch_idxs) > 0:
+            channels = [self.consoles[k].channels[ch_idx] for k, ch_idx in zip(console_idxs, ch_idxs)]
+            mix_buffer[console_idxs, ch_idxs] = Channel.process_batch(channels, block[:,ch_idxs])
+
+        # mix the channels of each console into its busses based on the send gains
+        bus_sends, master_sends = self._get_sends()
+        inputs = mix_buffer.reshape(K, C + B, num_samples * 2)
+        mix_buffer[:,C:] = np.matmul(bus_sends, inputs[:,:C]).reshape(K, B, num_samples, 2)
+
+        # skip the busses without a playing input whose processors are idle
+        active = np.ones((K, B), dtype=bool)
+        for k, console in enumerate(self.consoles):
+            for bus_idx, bus in enumerate(console.busses):
+                if silent is not None:
+                    active[k,bus_idx] = not self._skip_bus(bus, silent[k,:C], bus_sends[k,bus_idx], num_samples)
+                    silent[k,C+bus_idx] = bus.silent
+                else:
+                    bus.silent = False
+
+        console_idxs, bus_idxs = np.nonzero(active)
+        mix_buffer[:,C:][~active] = 0.0
+        chains = [self.consoles[k].busses[bus_idx].processors.get_all() for k, bus_idx in zip(console_idxs, bus_idxs)]
+        mix_buffer[console_idxs, C + bus_idxs] = self._process_chains(chains, mix_buffer[console_idxs, C + bus_idxs])
+
+        # finally combine channel and bus outputs on the master bus of each console
+        out[...] = np.matmul(np.expand_dims(master_sends, 1), inputs).reshape(K, num_samples, 2)
+
+        active = np.ones(K, dtype=bool)
+        if silent is not None:
+            for k, console in enumerate(self.consoles):
+                active[k] = not self._skip_bus(console.master, silent[k], master_sends[k], num_samples)
+        out[~active] = 0.0
+
+        console_idxs = np.flatnonzero(active)
+        chains = [self.consoles[k].master.processors.get_all() for k in console_idxs]
+        out[console_idxs] = self._process_chains(chains, out[console_idxs])
+
+        return out
+
+    def _skip_silent_channels(self, block, mix_buffer):
+        """ Skip the idle channels with a silent input and return the silent flags of all mixer inputs.
+
+        The flags have dimensions [consoles, channels + busses], as in `Console._skip_silent_channels()`.
+
+        """
+        silent = np.ones((self.batch_size, self.num_channels + self.num_busses), dtype=bool)
+        block_silent = np.max(np.abs(block), axis=0, initial=0.0) < SILENCE_THRESHOLD
+        silent[:,:block.shape[1]] = block_silent
+
+        for ch_idx in np.flatnonzero(block_silent):
+            for k, console in enumerate(self.consoles):
+                if console.channels[ch_idx].is_idle():
+                    console.channels[ch_idx].skip(block.shape[0])
+                    mix_buffer[k,ch_idx] = 0.0
+                else: # the channel still has a tail to process
+                    silent[k,ch_idx] = False
+
+        return silent
+
+    @staticmethod
+    def _skip_bus(bus, silent, sends, num_samples):
+        """ Skip the bus if none of its inputs are playing and its processors are idle (see `Bus.process()`). """
+        bus.silent = (not np.any(~silent & (sends > SILENCE_THRESHOLD))
+                      and all([processor.is_idle() for processor in bus.processors.get_all()]))
+        if bus.silent:
+            for processor in bus.processors.get_all():
+                processor.skip(num_samples)
+
+        return bus.silent
+
+    @staticmethod
+    def _process_chains(chains, data):
+        """ Apply chains of processors to stereo signals with dimensions [chains, samples, 2].
+
+        As in `Channel.process_batch()`, the chains with the same processor types in the same
+        order are processed together with each processor's `process_batch()`, and chains with
+        automated parameters in this block are processed one by one.
+
+        """
+        output = np.empty_like(data)
+
+        groups = {}
+        for idx, chain in enumerate(chains):
+            if any([processor.is_automated for processor in chain]):
+                signal = data[idx]
+                for processor in chain:
+                    signal = processor.process_automated(signal) if processor.is_automated else processor.process(signal)
+                output[idx] = signal
+                continue
+            signature = tuple([type(processor) for processor in chain])
+            groups.setdefault(signature, []).append(idx)
+
+        for signature, idxs in groups.items():
+            signals = np.ascontiguousarray(np.transpose(data[idxs], (1, 2, 0)))
+
+            for position, processor_type in enumerate(signature):
+                signals = processor_type.process_batch([chains[idx][position] for idx in idxs], signals)
+
+            output[idxs] = np.transpose(signals, (2, 0, 1))
+
+        return output
+
+    def _get_sends(self):
+        """ Return the linear send gains of the busses [consoles, busses, channels] and of the master [consoles, inputs].
+
+        The gains are taken from the cached routing matrix of each console (see `Console.routing_matrix`).
+
+        """
+        routing = np.stack([console.routing_matrix for console in self.consoles])
+
+        return np.ascontiguousarray(routing[:,:self.num_busses,:self.num_channels]), routing[:,self.num_busses]
+
+    def _get_mix_buffer(self, num_samples):
+        """ Return the work buffer with dimensions [consoles, channels + busses, samples, 2]. """
+        if self._mix_buffer is None or self._mix_buffer.shape[2] != num_samples:
+            self._mix_buffer = np.zeros((self.batch_size, self.num_channels + self.num_busses, num_samples, 2), dtype=self.dtype)
+
+        return self._mix_buffer
+
+    def render(self, multitrack, chunk_size=262144, out=None):
+        """ Render a complete multitrack through every console of the batch.
+
+        The tracks are read once and processed in chunks of `chunk_size` samples
+        (rounded to a multiple of the block size, or all at once with `chunk_size=None`),
+        as in `Console.render()`. When a console has automation the tracks are processed
+        block by block, so the output does not depend on the chunk size. The output has
+        dimensions [consoles, samples, 2].
+
+        """
+        num_samples = multitrack.num_blocks * self.block_size
+
+        if any([len(console.automation.lanes) > 0 for console in self.consoles]):
+            chunk_size = self.block_size
+        elif chunk_size is None:
+            chunk_size = max(self.block_size, num_samples)
+        else:
+            chunk_size = max(self.block_size, (chunk_size // self.block_size) * self.block_size)
+
+        if out is None:
+            out = np.empty((self.batch_size, num_samples, 2), dtype=self.dtype)
+
+        position = 0
+        for chunk in multitrack.iter_chunks(chunk_size, stop=num_samples):
+            self.process_block(chunk, out=out[:,position:position+chunk.shape[0]])
+            position += chunk.shape[0]
+
+        return out
+
+    def reset(self):
+        """ Clear the processor states of all consoles. """
+        for console in self.consoles:
+            console.reset()
+
+    @property
+    def parameter_store(self):
+        """ Return the `ParameterStore` of the first console, which has the same layout as all others. """
+        return self.consoles[0].parameter_store
+
+    @property
+    def values(self):
+        """ Return the encoded parameter values of all consoles with dimensions [consoles, parameters]. """
+        return np.stack([console.parameter_store.values for console in self.consoles])
+
+    def set_values(self, values):
+        """ Set the parameters of each console from encoded values with dimensions [consoles, parameters]. """
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape[0] != self.batch_size:
+            raise ValueError(f"Expected values for {self.batch_size} consoles, got {values.shape[0]}.")
+
+        for console, console_values in zip(self.consoles, values):
+            console.parameter_store.set_values(console_values)
+
+    def randomize(self):
+        """ Shuffle the core processors of each channel and draw new parameters for every console.
+
+        All parameter sets are drawn at once with `ParameterStore.sample()`, and as in
+        `Console.randomize()` the master bus and parameters with `randomize_value`
+        disabled keep their values.
+
+        """
+        for console in self.consoles:
+            for channel in console.channels:
+                channel.processors.shuffle()
+
+        store = self.parameter_store
+        mask = store.randomizable & self.consoles[0]._randomize_mask
+
+        values = self.values
+        values[:,mask] = store.sample(self.batch_size)[:,mask]
+        self.set_values(values)
+
+    def vectorize(self):
+        """ Return the normalized parameters of all consoles with dimensions [consoles, vector_size]. """
+        return self.parameter_store.vectorize(self.values)
+
+    def devectorize(self, vectors):
+        """ Set the parameters of all consoles from vectors created by `vectorize()`. """
+        self.set_values(self.parameter_store.devectorize(vectors))
@@ -1,14 +1,20 @@
+import copy
+import itertools
 import numpy as np
 
 from .parameter import Parameter
+from .processor import SILENCE_THRESHOLD
 from .processor_list import ProcessorList
 from .parameter_list import ParameterList
 
 from .processors import *
 
+# source of the send versions, which are unique across all busses
+_versions = itertools.count()
+
 class Bus:
 
-    def __init__(self, sample_rate, block_size, n_inputs, sends=None, master=False):
+    def __init__(self, sample_rate, block_size, n_inputs, sends=None, master=False, dtype="float64"):
         """ Create a bus (or aux). 
 
         Take channels as input and apply processing to the group
@@ -29,6 +35,14 @@ class Bus:
         self.block_size = block_size
         self.n_inputs = n_inputs
         self.master = master
+        self.dtype = dtype
+
+        # True if the last block was skipped because the bus was silent
+        self.silent = False
+
+        # linear send gains (see `gains`) and a version that changes with the sends (see `Console.routing_matrix`)
+        self._gains = None
+        self.version = next(_versions)
 
         if not sends:
             if self.master:
@@ -38,27 +52,102 @@ class Bus:
         else:
             self.sends = sends
 
-        self.processors = ProcessorList(block_size=block_size, sample_rate=sample_rate)
+        self.processors = ProcessorList(block_size=block_size, sample_rate=sample_rate, dtype=dtype)
 
         # setup the mixing inputs (channel sends)
         self.parameters = ParameterList()
         for ch_idx in np.arange(n_inputs):
-            self.parameters.add(Parameter(f"ch{ch_idx}-send", self.sends[ch_idx], "float", units="dB", minimum=-120.0, maximum=12.0, mu=-30.0, sigma=12.0))
+            self.parameters.add(Parameter(f"ch{ch_idx}-send", self.sends[ch_idx], "float", processor=self, units="dB", minimum=-120.0, maximum=12.0, mu=-30.0, sigma=12.0))
 
         if master:
             self.processors.add(Equaliser(name="master-eq"))
             self.processors.add(Compressor(name="master-compressor"))
 
-    def process(self, block):
+    def process(self, block, out=None, silent=None):
+        """ Mix the inputs down to stereo and apply the bus processors.
+
+        The input block has dimensions [inputs, samples, 2]
+        and the output has dimensions [samples, 2].
+
+        If `out` is given the output is written into it and returned.
+
+        `silent` optionally flags the inputs that are silent in this block. When no
+        input with an open send (above -120 dB) is playing and all bus processors 
+        are idle, the mixdown and processing are skipped and the output is silence.
+
+        """
+        if out is None:
+            out = np.empty(block.shape[1:], dtype=block.dtype)
 
         # create a stereo mixdown of all channels based on send gains
-        sends = [p.db2linear() for n, p in self.parameters]
-        bus_buffer = np.sum(block * sends, axis=2)
+        sends = self.gains.astype(block.dtype, copy=False)
+        playing = silent is None or np.any(~silent & (sends > SILENCE_THRESHOLD))
 
-        for processor in self.processors.get_all():
-            bus_buffer = processor.process(bus_buffer)
+        if playing or not self.is_idle():
+            inputs = block.reshape(block.shape[0], -1)
+            if out.flags.c_contiguous:
+                np.matmul(sends, inputs, out=out.reshape(-1))
+            else:
+                out[...] = np.matmul(sends, inputs).reshape(out.shape)
+
+        return self.process_mix(out, playing=playing)
+
+    def process_mix(self, mix, playing=True):
+        """ Apply the bus processors in place to a stereo mixdown of the inputs [samples, 2].
 
-        return bus_buffer
+        This is used by the console, which mixes the inputs of all busses at once 
+        (see `Console.routing_matrix`). If `playing` is False (no input with an open
+        send is playing) and all bus processors are idle, the processing is skipped
+        and the output is silence.
+
+        """
+        self.silent = not playing and self.is_idle()
+        if self.silent:
+            for processor in self.processors.get_all():
+                processor.skip(mix.shape[0])
+            mix[...] = 0.0
+            return mix
+
+        bus_buffer = mix
+        for processor in self.processors.get_all():
+            if processor.is_automated:
+                bus_buffer = processor.process_automated(bus_buffer)
+            else:
+                bus_buffer = processor.process(bus_buffer)
+
+        if bus_buffer is not mix:
+            mix[...] = bus_buffer
+
+        return mix
+
+    def is_idle(self):
+        """ Return True if all bus processors are idle (see `Processor.is_idle()`). """
+        return all([processor.is_idle() for processor in self.processors.get_all()])
+
+    @property
+    def gains(self):
+        """ Return the linear send gains, which are only recomputed after a send changed. """
+        if self._gains is None:
+            self._gains = np.array([p.db2linear() for n, p in self.parameters])
+        return self._gains
+
+    def update(self, parameter_name):
+        # called by the send parameters when they change
+        self._gains = None
+        self.version = next(_versions)
+
+    @property
+    def is_deferred(self):
+        return False
+
+    def clone(self):
+        """ Return a copy of the bus with cloned processors and sends (see `Processor.clone()`). """
+        bus = copy.copy(self)
+        bus.sends = copy.copy(self.sends)
+        bus.processors = self.processors.clone()
+        bus.parameters = self.parameters.clone(processors={id(self) : bus})
+        bus.silent = False
+        return bus
 
     def serialize(self, **kwargs):
 
@@ -1,3 +1,4 @@
+import copy
 import numpy as np
 from itertools import permutations
 
@@ -5,52 +6,113 @@ from .processor_list import ProcessorList
 from .processors import *
 
 class Channel():
-    def __init__(self, sample_rate, block_size):
+    def __init__(self, sample_rate, block_size, dtype="float64"):
         self.sample_rate = sample_rate
         self.block_size = block_size
+        self.dtype = dtype
 
         # short-hand for init
         sr = sample_rate
         bs = block_size
 
         # pre-processors (order is not shuffled)
-        self.pre_processors = ProcessorList(block_size=bs, sample_rate=sr)
+        self.pre_processors = ProcessorList(block_size=bs, sample_rate=sr, dtype=dtype)
         self.pre_processors.add(Gain(name="pre-gain", block_size=bs, sample_rate=sr))
         self.pre_processors.add(PolarityInverter(name="polarity-inverter", block_size=bs, sample_rate=sr))
 
         # core insert processors (order is shuffled on randomize)                           
-        self.processors = ProcessorList(block_size=bs, sample_rate=sr)
+        self.processors = ProcessorList(block_size=bs, sample_rate=sr, dtype=dtype)
         self.processors.add(Equaliser(name="eq", block_size=bs, sample_rate=sr))
         self.processors.add(Compressor(name="compressor", block_size=bs, sample_rate=sr))
         #self.processors.add(ConvolutionalReverb(name="reverb", block_size=bs, sample_rate=sr))
         #self.processors.add(Delay(name="delay", block_size=bs, sample_rate=sr))
 
         # post-processors (order is not shuffled)
-        self.post_processors = ProcessorList(block_size=bs, sample_rate=sr)
+        self.post_processors = ProcessorList(block_size=bs, sample_rate=sr, dtype=dtype)
         self.post_processors.add(Gain(name="post-gain", block_size=bs, sample_rate=sr)) # fader
         self.post_processors.add(Panner(name="panner", block_size=bs, sample_rate=sr))
 
     def process(self, ch_buffer):
 
         for processor in self.get_all_processors():
-            ch_buffer = processor.process(ch_buffer)
+            if processor.is_automated:
+                ch_buffer = processor.process_automated(ch_buffer)
+            else:
+                ch_buffer = processor.process(ch_buffer)
 
         return ch_buffer
 
+    @staticmethod
+    def process_batch(channels, block, out=None):
+        """ Process a block for a set of channels at once.
+
+        The input block has dimensions [samples, channels] (all inputs are mono)
+        and the output has dimensions [channels, samples, 2]. If `out` is given 
+        the output is written into it and returned.
+
+        Channels whose processor chains contain the same processor types
+        in the same order are grouped together, and each stage of the chain
+        is applied to the whole group with the processor's `process_batch()`.
+        Channels with automated parameters in this block are processed one by one.
+
+        """
+        if out is None:
+            out = np.empty((len(channels), block.shape[0], 2), dtype=block.dtype)
+
+        groups = {}
+        chains = [channel.get_all_processors() for channel in channels]
+        for ch_idx, chain in enumerate(chains):
+            if any([processor.is_automated for processor in chain]): # automated channels follow their curves on their own
+                out[ch_idx] = channels[ch_idx].process(block[:,ch_idx])
+                continue
+            signature = tuple([type(processor) for processor in chain])
+            groups.setdefault(signature, []).append(ch_idx)
+
+        for signature, ch_idxs in groups.items():
+            group = [chains[ch_idx] for ch_idx in ch_idxs]
+            data = block[:,ch_idxs]
+
+            for idx, processor_type in enumerate(signature):
+                data = processor_type.process_batch([chain[idx] for chain in group], data)
+
+            if data.ndim < 3: # if output is mono copy to L and R
+                data = np.expand_dims(data, 1)
+
+            out[ch_idxs] = np.transpose(data, (2, 0, 1))
+
+        return out
+
+    def clone(self):
+        """ Return a copy of the channel with cloned processors (see `Processor.clone()`). """
+        channel = copy.copy(self)
+        channel.pre_processors  = self.pre_processors.clone()
+        channel.processors      = self.processors.clone()
+        channel.post_processors = self.post_processors.clone()
+        return channel
+
+    def is_idle(self):
+        """ Return True if every processor would output silence for a silent input. """
+        return all([processor.is_idle() for processor in self.get_all_processors()])
+
+    def skip(self, num_samples):
+        """ Advance all processors over `num_samples` of silence (see `Processor.skip()`). """
+        for processor in self.get_all_processors():
+            processor.skip(num_samples)
+
     def reset(self):
         for processor in self.get_all_processors():
             processor.reset()
 
     def randomize(self, shuffle=True):
 
-        # randomize each processor configuration
-        for processor in self.get_all_processors():   
-            processor.randomize()
-
         # randomize settings of core processors only
         if shuffle:
             self.processors.shuffle()
 
+        # randomize each processor configuration
+        for processor in self.get_all_processors():   
+            processor.randomize()
+
     def serialize(self):
 
         serialized_processors = {"pre_processors"  : [],
@@ -74,9 +136,30 @@ class Channel():
 
         return serialized_processors
 
+    @property
+    def is_automated(self):
+        return any([processor.is_automated for processor in self.get_all_processors()])
+
     def get_all_processors(self):
         return self.pre_processors.get_all() + self.processors.get_all() + self.post_processors.get_all()
 
+    def vectorize(self, static_order=None):
+        """ Create a list with the normalized parameter values of all processors.
+
+        With `static_order` (a list of processor names) the core processors appear
+        in that order, skipping names not in the channel, so the layout does not
+        depend on how the processors were shuffled.
+
+        """
+        core_processors = self.processors.get_all()
+        if static_order is not None:
+            core_processors = [processor for name in static_order for processor in core_processors if processor.name == name]
+
+        vals = []
+        for processor in self.pre_processors.get_all() + core_processors + self.post_processors.get_all():
+            vals += processor.vectorize()
+        return vals
+
     def params_to_file(self, output_file="ch-params.txt"):
         """ Save a text file containing the parameters and vectorized verions for each proecessor. 
 
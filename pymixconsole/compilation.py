@@ -0,0 +1,109 @@
+""" Compilation of the numba kernels.
+
+All kernels are compiled with `cache=True`, so each type signature is
+compiled once and then loaded from the on-disk cache (next to the modules,
+or in `NUMBA_CACHE_DIR`) by every new process. `warmup()` runs every
+processor and both console engines on small blocks, which compiles or loads
+all signatures used by the console up front instead of on the first block.
+
+After a warm-up, compiling any other signature of a pymixconsole kernel
+(e.g. for an unexpected dtype or number of dimensions) is reported with a
+`RuntimeWarning` and recorded in `recompilations()`. This relies on the
+compilation events of numba 0.53 and newer, and is skipped on older versions.
+
+Example for a batch worker
+>>> import pymixconsole as pymc
+>>> pymc.warmup()
+
+"""
+import time
+import warnings
+import numpy as np
+
+try:
+    from numba.core import event
+except ImportError: # numba < 0.53 has no compilation events
+    event = None
+
+from .console import Console, ENGINES, DTYPES
+from .processors import *
+
+PROCESSORS = [Gain, PolarityInverter, Panner, Equaliser, Compressor, Delay,
+              Distortion, AlgorithmicReverb, ConvolutionalReverb]
+
+_warmed_up = False
+_recompilations = []
+
+if event is not None:
+    class _CompilationListener(event.Listener):
+        """ Record the kernels compiled after the warm-up. """
+
+        def on_start(self, ev):
+            pass
+
+        def on_end(self, ev):
+            dispatcher = ev.data["dispatcher"]
+            if _warmed_up and dispatcher.py_func.__module__.startswith(__package__):
+                name = f"{dispatcher.py_func.__module__}.{dispatcher.py_func.__name__}"
+                signature = ", ".join([str(arg) for arg in ev.data["args"]])
+                _recompilations.append((name, signature))
+                warnings.warn(f"Unexpected compilation of {name}({signature}) after warm-up.", RuntimeWarning)
+
+    event.register("numba:compile", _CompilationListener())
+
+def warmup(dtypes=DTYPES, block_size=512, sample_rate=44100):
+    """ Compile or load every kernel signature used by the console.
+
+    Each processor processes mono and stereo blocks, batches of channels and
+    automated blocks in every precision, and then consoles with each engine
+    process a block. Returns the time it took in seconds.
+
+    dtypes (list): Precisions to prepare ("float64" and/or "float32")
+    block_size (int): Block size of the warm-up blocks
+    sample_rate (int): Sample rate of the warm-up processors
+
+    """
+    global _warmed_up
+    start = time.perf_counter()
+    _warmed_up = False
+    _recompilations.clear()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+
+        for dtype in dtypes:
+            rng = np.random.RandomState(0)
+            mono   = (rng.rand(block_size) - 0.5).astype(dtype)
+            stereo = (rng.rand(block_size, 2) - 0.5).astype(dtype)
+
+            for processor_class in PROCESSORS:
+                processors = [processor_class(block_size=block_size, sample_rate=sample_rate) for _ in range(2)]
+                for processor in processors:
+                    processor.dtype = dtype
+                    for name, parameter in processor.parameters:
+                        if parameter.kind == "float" and name != "decay": # (a decay ramp reloads the impulse)
+                            parameter.value = (parameter.min + parameter.max) / 2
+
+                for x in [mono, stereo]:
+                    processors[0].process(x.copy())
+
+                    # a batch of two channels with dimensions [samples, (2,) channels]
+                    processor_class.process_batch(processors, np.stack([x, x], axis=-1))
+
+                    for name, parameter in processors[1].parameters:
+                        if parameter.kind == "float" and name != "decay":
+                            processors[1].automate(name, np.linspace(parameter.min, parameter.max, block_size))
+                    processors[1].process_automated(x.copy())
+
+            for engine in ENGINES:
+                console = Console(block_size=block_size, sample_rate=sample_rate, num_channels=2,
+                                  engine=engine, dtype=dtype)
+                console.process_block(np.stack([mono, mono], axis=-1))
+
+    _warmed_up = True
+
+    return time.perf_counter() - start
+
+def recompilations():
+    """ Return (kernel, signature) for each kernel compiled after the last `warmup()` (always empty on numba < 0.53). """
+    return list(_recompilations)
@@ -1,8 +1,7 @@
-from numba import jit
+from ..util.jit import jit
 import numpy as np
-import scipy.signal
 
-@jit(nopython=True)
+@jit(nopython=True, nogil=True, cache=True)
 def n_process(data, buffer, buffer_size, buffer_idx, feedback):
 
     M = data.shape[0]
@@ -1,8 +1,7 @@
-from numba import jit
+from ..util.jit import jit
 import numpy as np
-import scipy.signal
 
-@jit(nopython=True)
+@jit(nopython=True, nogil=True, cache=True)
 def n_process(data, buffer, buffer_size, buffer_idx, filterstore, feedback, damp1, damp2):
 
     M = data.shape[0]
@@ -34,7 +33,7 @@ class Comb(object):
         self.reset()
 
     def process(self, data):
-        data, self._buffer, self._buffer_idx, self._filterstore = n_process(data, self._buffer, self.buffer_size, self._buffer_idx, self._filterstore, self.feedback, 0, 0)#self._damp1, self._damp2)
+        data, self._buffer, self._buffer_idx, self._filterstore = n_process(data, self._buffer, self.buffer_size, self._buffer_idx, self._filterstore, self.feedback, self._damp1, self._damp2)
         return data
 
     def reset(self):
@@ -1,7 +1,5 @@
-from numba import jit, float64
 
 from textwrap import dedent
-import scipy.signal
 import numpy as np
 
 class IIRfilter(object):
@@ -36,6 +34,7 @@ class IIRfilter(object):
 
         # calculate biquad coefficients
         self.generate_coefficients()
+        self.reset_state()
 
     def __str__(self):
         filter_info = dedent("""
@@ -159,7 +158,6 @@ class IIRfilter(object):
             raise ValueError("Invalid filter type", self.filter_type)            
 
         self.b, self.a = np.array([b0, b1, b2])/a0, np.array([a0, a1, a2])/a0
-        self.reset_state()
 
     def apply_filter(self, data):
         """ Apply the IIR filter to an input signal.
@@ -180,11 +178,32 @@ class IIRfilter(object):
         else:              
             zi_ch = self.zi
 
+        import scipy.signal # (imported on first use, it is slow to import)
+
         # apply the filter and update the filter state
         y, self.zi = scipy.signal.lfilter(self.b, self.a, np.squeeze(data), axis=0, zi=zi_ch)
 
         return self.passband_gain * y
 
+    def set_parameters(self, G=None, Q=None, fc=None, rate=None, filter_type=None):
+        """ Change several filter parameters and generate the coefficients once.
+
+        Setting the properties one by one regenerates the coefficients
+        on every assignment. Parameters left as None are unchanged.
+        """
+        if G is not None:
+            self.__G = G
+        if Q is not None:
+            self.__Q = Q
+        if fc is not None:
+            self.__fc = fc
+        if rate is not None:
+            self.__rate = rate
+        if filter_type is not None:
+            self.__filter_type = filter_type
+
+        self.generate_coefficients()
+
     @property
     def G(self):
         return self.__G
@@ -1,13 +1,25 @@
+import os
+import copy
 import json
-import warnings
+import queue
 import pickle
+import warnings
+import threading
 import numpy as np
-from graphviz import Digraph
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
 
 from .channel import Channel
 from .processors import *
 from .bus import Bus
+from .processor import SILENCE_THRESHOLD
+from .automation import Automation
+from .parameter_store import ParameterStore
 from .util import logger, jsonencoder
+from .util.wavwriter import WavWriter
+
+ENGINES = ["channel", "vectorized"]
+DTYPES  = ["float64", "float32"]
 
 class Console:
     """ Top level interface for the mixing console. 
@@ -22,7 +34,7 @@ class Console:
 
     """
 
-    def __init__(self, multitrack=None, block_size=512, sample_rate=44100, num_channels=1, num_busses=2, verbose=False):
+    def __init__(self, multitrack=None, block_size=512, sample_rate=44100, num_channels=1, num_busses=2, engine="channel", dtype="float64", num_threads=1, skip_silence=True, verbose=False):
         """ Create a mixing console.
 
         There are two options to intialize a console.
@@ -38,6 +50,27 @@ class Console:
         channel blocks into the `process_block()` function, or
         optionally load a multitrack object later. 
 
+        The `engine` selects how the channel stage is processed. With
+        "channel" each channel runs its processors one after another,
+        while "vectorized" processes all channels that share the same
+        chain of processors at once on the full [samples, channels] block.
+        Both engines produce the same output.
+
+        The `dtype` ("float64" or "float32") sets the precision of the whole
+        signal path: the console buffers and every processor's coefficients,
+        kernels and state. Inputs are converted to it at the start of each block.
+
+        With `num_threads` larger than 1 the channels, and then the FX busses,
+        are processed concurrently on a pool of threads (the compiled kernels
+        release the GIL). Every channel and bus writes to its own row of the
+        work buffer and all mixing happens afterwards in a fixed order, so the
+        output does not depend on the number of threads.
+
+        With `skip_silence` channels whose input is silent (below -120 dB) and whose
+        processors are idle (filter states, delay and reverb tails have decayed)
+        are not processed, and busses without any playing input are skipped in 
+        the same way, so silent parts of the stems cost almost nothing.
+
         It would be cool to have in here a method that will draw a 
         diagram of the mixing console routing and the parameters of 
         each processor.
@@ -59,19 +92,29 @@ class Console:
         else:
             raise ValueError("Pass either multitrack object or provide all initialization parameters.")
 
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid engine {engine}. Must be one of {ENGINES}.")
+        if np.dtype(dtype) not in DTYPES:
+            raise ValueError(f"Invalid dtype {dtype}. Must be one of {DTYPES}.")
+
         self.num_busses = num_busses
+        self.engine = engine
+        self.dtype = np.dtype(dtype)
+        self.num_threads = num_threads
+        self.skip_silence = skip_silence
+        self._executor = None
         self.log = logger.createLog(logger.LOG_NAME)
         self.verbose = verbose
 
         # create each channel of the mix console
         self.channels = []
         for ch_idx in range(self.num_channels):
-            self.channels.append(Channel(self.sample_rate, self.block_size))
+            self.channels.append(Channel(self.sample_rate, self.block_size, dtype=self.dtype))
 
         # setup some FX busses
         self.busses = []
         sends = np.zeros(self.num_channels)
-        self.busses.append(Bus(self.sample_rate, self.block_size, self.num_channels)) # bus 1 - delay
+        self.busses.append(Bus(self.sample_rate, self.block_size, self.num_channels, dtype=self.dtype)) # bus 1 - delay
         self.busses[0].processors.add(Delay(name="delay"))
         self.busses[0].processors.add(Equaliser(name="post-eq"))
         # set wet = 1 and dry = 0 and do not change them on randomize
@@ -80,7 +123,7 @@ class Console:
         self.busses[0].processors.get("delay").parameters.dry_mix.randomize_value = False
         self.busses[0].processors.get("delay").parameters.wet_mix.randomize_value = False
 
-        self.busses.append(Bus(self.sample_rate, self.block_size, self.num_channels)) # bus 2 - reverb
+        self.busses.append(Bus(self.sample_rate, self.block_size, self.num_channels, dtype=self.dtype)) # bus 2 - reverb
         self.busses[1].processors.add(ConvolutionalReverb(name="reverb"))
         self.busses[1].processors.add(Equaliser(name="post-eq"))
         # set wet = 1 and dry = 0 and do not change them on randomize
@@ -90,7 +133,25 @@ class Console:
         self.busses[1].processors.get("reverb").parameters.wet_mix.randomize_value = False
 
         # setup the master bus (which is a special kind of bus)
-        self.master = Bus(self.sample_rate, self.block_size, self.num_channels + self.num_busses, master=True)
+        self.master = Bus(self.sample_rate, self.block_size, self.num_channels + self.num_busses, master=True, dtype=self.dtype)
+
+        # parameter automation and the number of samples processed since the last reset
+        self.automation = Automation(self.sample_rate)
+        self.position = 0
+
+        # array-backed store of all parameters (built on first use, see `parameter_store`)
+        self._parameter_store = None
+        self._parameter_store_key = None
+
+        # cached routing matrix of the sends (see `routing_matrix`)
+        self._routing = None
+
+        # DSP states captured while rendering, by sample position (see `render()`)
+        self.keyframes = {}
+
+        # preallocate the work buffers used by process_block()
+        self._mix_buffer = None
+        self._get_mix_buffer(self.block_size)
 
     def set_console_parameters(self):
         pass
@@ -100,11 +161,217 @@ class Console:
 
         input_buffer  = next(self.multitrack)
         output_buffer = self.process_block(input_buffer)
-        downmix_buffer = self.downmix_multitrack_block(output_buffer)
 
-        return  input_buffer, downmix_buffer
+        return  input_buffer, output_buffer
+
+    def render(self, multitrack=None, chunk_size=262144, out=None, start=0, keyframe_interval=None):
+        """ Render a complete multitrack offline.
+
+        Instead of stepping through the multitrack block by block,
+        the tracks are processed in chunks of `chunk_size` samples 
+        (rounded to a multiple of the block size). Pass `chunk_size=None`
+        to process the entire tracks in one shot, which needs buffers
+        for the full length of every channel and bus. Multitracks streamed 
+        from stem files read the next chunks in the background meanwhile.
+
+        The output matches calling `process_next_block()` over all
+        full blocks of the multitrack and has dimensions [samples, 2].
+
+        With `keyframe_interval` the DSP state (see `get_state()`) is captured
+        at the start and every `keyframe_interval` seconds into `self.keyframes`,
+        so that `seek()` can later jump to any position of the render.
+
+        multitrack (Multitrack): Tracks to render (defaults to the console multitrack)
+        chunk_size (int): Number of samples processed per call to `process_block()`
+        out (ndarray): Optional array to write the output into
+        start (int): First sample to render (rounded down to the block size), e.g. after `seek()`
+        keyframe_interval (float): Seconds between the captured keyframes
+
+        """
+        if multitrack is None:
+            multitrack = self.multitrack
+
+        num_samples = multitrack.num_blocks * self.block_size
+        start = (start // self.block_size) * self.block_size
+
+        if chunk_size is None:
+            chunk_size = max(self.block_size, num_samples - start)
+        else:
+            chunk_size = max(self.block_size, (chunk_size // self.block_size) * self.block_size)
+
+        if out is None:
+            out = np.empty((num_samples - start, 2), dtype=self.dtype)
+
+        def capture(position):
+            self.keyframes[position] = self.get_state()
+
+        for position, chunk in self._iter_chunks(multitrack, chunk_size, start, num_samples, keyframe_interval, capture):
+            self.process_block(chunk, out=out[position-start:position-start+chunk.shape[0],:])
+
+        return out
+
+    def _iter_chunks(self, multitrack, chunk_size, start, stop, keyframe_interval=None, on_keyframe=None):
+        """ Yield (position, chunk) pairs over the multitrack for rendering.
+
+        With a `keyframe_interval` (in seconds, rounded to whole blocks) the chunks are
+        split so that every keyframe position ends a chunk, and `on_keyframe(position)`
+        is called before the first chunk and after each chunk ending on a keyframe.
+
+        When parameters are automated the chunks are split into blocks, since the
+        automation is evaluated once per call to `process_block()`. The output then
+        does not depend on the chunk size.
+
+        """
+        step = None
+        if keyframe_interval is not None:
+            step = max(1, int(round(keyframe_interval * self.sample_rate / self.block_size))) * self.block_size
+            on_keyframe(start)
+
+        max_samples = self.block_size if len(self.automation.lanes) > 0 else None
+
+        position = start
+        for chunk in multitrack.iter_chunks(chunk_size, start=start, stop=stop):
+            while chunk.shape[0] > 0:
+                num_samples = chunk.shape[0] if step is None else min(chunk.shape[0], step - position % step)
+                if max_samples is not None:
+                    num_samples = min(num_samples, max_samples)
+                yield position, chunk[:num_samples]
+                chunk = chunk[num_samples:]
+                position += num_samples
+                if step is not None and position % step == 0:
+                    on_keyframe(position)
+
+    def seek(self, multitrack, position, chunk_size=65536):
+        """ Bring the console to its state at sample `position` of a render with keyframes.
+
+        The latest keyframe at or before `position` is restored and the samples from
+        there up to `position` (rounded down to the block size) are processed, so that 
+        `render(multitrack, start=position)` continues exactly like the original render.
+
+        Returns the position the console is at.
+
+        """
+        position = (position // self.block_size) * self.block_size
+        keyframe_positions = [keyframe for keyframe in self.keyframes if keyframe <= position]
+        if len(keyframe_positions) == 0:
+            raise ValueError(f"No keyframe at or before sample {position}. Render with a `keyframe_interval` first.")
+
+        keyframe = max(keyframe_positions)
+        self.set_state(self.keyframes[keyframe])
 
-    def process_block(self, block):
+        chunk_size = max(self.block_size, (chunk_size // self.block_size) * self.block_size)
+        out = np.empty((chunk_size, 2), dtype=self.dtype)
+        for _, chunk in self._iter_chunks(multitrack, chunk_size, keyframe, position):
+            self.process_block(chunk, out=out[:chunk.shape[0]])
+
+        return position
+
+    def render_to_file(self, multitrack, path, chunk_size=65536, queue_size=4, keyframe_interval=None, keyframe_path=None, resume=False):
+        """ Render a complete multitrack directly to a file.
+
+        Each rendered chunk is passed through a bounded queue to a writer thread,
+        so processing and disk I/O overlap and memory use does not grow with the
+        length of the multitrack. A `.npy` path is written as a memory-mapped 
+        32 bit float array, any other path as a 32 bit float WAV file.
+
+        With `keyframe_interval` the DSP state is saved to `keyframe_path` (the output
+        path with ".state" appended by default) every `keyframe_interval` seconds, once all
+        audio before it has been written. If a render is interrupted, calling this again with
+        `resume=True` restores the last keyframe and continues the file from there.
+
+        multitrack (Multitrack): Tracks to render (None for the console multitrack)
+        path (str): Output file path
+        chunk_size (int): Number of samples processed per call to `process_block()`
+        queue_size (int): Maximum number of rendered chunks waiting to be written
+        keyframe_interval (float): Seconds between saved keyframes
+        keyframe_path (str): File for the latest keyframe
+        resume (bool): Continue from the keyframe in `keyframe_path` if it exists
+
+        Returns the number of samples written.
+
+        """
+        if multitrack is None:
+            multitrack = self.multitrack
+        if keyframe_path is None:
+            keyframe_path = f"{path}.state"
+
+        num_samples = multitrack.num_blocks * self.block_size
+        chunk_size  = max(self.block_size, (chunk_size // self.block_size) * self.block_size)
+
+        start = None
+        if resume and os.path.exists(keyframe_path):
+            with open(keyframe_path, "rb") as fp:
+                keyframe = pickle.load(fp)
+            self.set_state(keyframe["state"])
+            start = keyframe["position"]
+
+        if str(path).endswith(".npy"):
+            mode = "w+" if start is None else "r+"
+            memmap = np.lib.format.open_memmap(path, mode=mode, dtype=np.float32, shape=(num_samples, 2))
+            def write(start, frames):
+                memmap[start:start+frames.shape[0]] = frames
+            def close():
+                memmap.flush()
+        else:
+            writer = WavWriter(path, self.sample_rate, num_channels=2, start=start)
+            def write(start, frames):
+                writer.write(frames)
+            def close():
+                writer.close()
+
+        def save_keyframe(position, state):
+            # replace the previous keyframe only once the new one is complete
+            with open(keyframe_path + ".tmp", "wb") as fp:
+                pickle.dump({"position" : position, "state" : state}, fp)
+            os.replace(keyframe_path + ".tmp", keyframe_path)
+
+        # output buffers are recycled once written (one being filled, one being written and the queued ones)
+        buffers = [np.empty((chunk_size, 2), dtype=self.dtype) for _ in range(queue_size + 2)]
+        chunks  = queue.Queue(maxsize=queue_size)
+        errors  = []
+
+        def writer_thread():
+            while True:
+                item = chunks.get()
+                if item is None:
+                    break
+                if not errors:
+                    try:
+                        position, frames, state = item
+                        if frames is not None:
+                            write(position, frames)
+                        if state is not None:
+                            save_keyframe(position, state)
+                    except Exception as e:
+                        errors.append(e)
+
+        thread = threading.Thread(target=writer_thread, daemon=True)
+        thread.start()
+
+        def capture(position):
+            chunks.put((position, None, self.get_state()))
+
+        position = 0 if start is None else start
+        try:
+            for idx, (position, chunk) in enumerate(self._iter_chunks(multitrack, chunk_size, position, num_samples,
+                                                                      keyframe_interval, capture)):
+                if errors:
+                    break
+                out = buffers[idx % len(buffers)][:chunk.shape[0]]
+                self.process_block(chunk, out=out)
+                chunks.put((position, out, None))
+                position += chunk.shape[0]
+        finally:
+            chunks.put(None)
+            thread.join()
+            close()
+
+        if errors:
+            raise errors[0]
+
+        return position
+
+    def process_block(self, block, out=None):
         """ Apply processors on the given block of audio 
         
         The input block has dimensions [samples, in_channels]
@@ -112,33 +379,239 @@ class Console:
 
         The output buffer has dimensions [samples, out_channels]
         (all output channels are stereo)
+
+        If `out` is given the output is written into it and returned,
+        otherwise a new array is allocated for the output. All intermediate
+        results are stored in buffers owned by the console that are
+        reused for every block.
         
         """
 
-        master_buffer = np.zeros((block.shape[0], 2))
-        bus_buffer    = np.zeros((block.shape[0], 2, self.num_busses))
-        ch_buffer     = np.zeros((block.shape[0], 2, self.num_channels))
-
         if block.ndim == 1:
-            ch_buffer = np.zeros((block.shape[0], 2, self.num_channels))
             block = np.expand_dims(block, -1)
-            num_block_channels = 1
-        else:
-            ch_buffer = np.zeros((block.shape[0], 2, self.num_channels))	
-            num_block_channels = block.shape[1]
+        block = block.astype(self.dtype, copy=False)
+        num_block_channels = block.shape[1]
+
+        if out is None:
+            out = np.empty((block.shape[0], 2), dtype=self.dtype)
 
-        # apply channel processing
-        for ch_idx in np.arange(num_block_channels):
-            ch_buffer[:,:,ch_idx] = self.channels[ch_idx].process(block[:,ch_idx])
+        # evaluate the automation curves for this block
+        self.automation.apply(self.position, block.shape[0])
+        self.position += block.shape[0]
 
-        # take the outputs of all channels to apply bus processing
-        for bus_idx in np.arange(self.num_busses):
-            bus_buffer[:,:,bus_idx] = self.busses[bus_idx].process(ch_buffer)
+        # channel-major buffer with the output of each channel followed by each bus
+        mix_buffer = self._get_mix_buffer(block.shape[0])
+        ch_buffer  = mix_buffer[:self.num_channels]
+        ch_buffer[num_block_channels:] = 0.0
+
+        # skip the channels with a silent input whose processors are idle
+        silent = self._skip_silent_channels(block, ch_buffer) if self.skip_silence else None
+        active = np.arange(num_block_channels) if silent is None else np.flatnonzero(~silent[:num_block_channels])
+        ch_silent = None if silent is None else silent[:self.num_channels]
+
+        if self.num_threads > 1:
+            self._process_threaded(block, mix_buffer, active, ch_silent)
+        else:
+            # apply channel processing
+            if self.engine == "vectorized":
+                self._process_channel_batch(active, block, ch_buffer)
+            else:
+                for ch_idx in active:
+                    ch_buffer[ch_idx] = self.channels[ch_idx].process(block[:,ch_idx])
+
+            # mix the outputs of all channels into the busses to apply bus processing
+            playing = self._mix_busses(mix_buffer, ch_silent)
+            for bus_idx, bus in enumerate(self.busses):
+                bus.process_mix(mix_buffer[self.num_channels+bus_idx], playing=playing[bus_idx])
 
         # finally combine channel and bus outputs for the master bus
-        master_buffer = self.master.process(np.concatenate((ch_buffer, bus_buffer), axis=2))
+        if silent is not None:
+            silent[self.num_channels:] = [bus.silent for bus in self.busses]
+        routing, (_, master_cols) = self._get_routing()
+        inputs = mix_buffer.reshape(mix_buffer.shape[0], -1)
+        if out.flags.c_contiguous:
+            playing = self._mix(routing[self.num_busses:], master_cols, inputs, silent, out.reshape(1, -1))
+        else:
+            mixdown = np.empty((1, out.size), dtype=self.dtype)
+            playing = self._mix(routing[self.num_busses:], master_cols, inputs, silent, mixdown)
+            out[...] = mixdown.reshape(out.shape)
+        self.master.process_mix(out, playing=playing[0])
+
+        return out
+
+    @property
+    def routing_matrix(self):
+        """ Return the linear gains from the inputs of the mixdowns to the busses and the master.
+
+        The matrix has dimensions [busses + 1, channels + busses]. Each row holds the sends
+        of one bus followed by the master sends, and each column is a channel followed by
+        the busses (which only feed the master). Sends at or below -120 dB are closed
+        and have a gain of zero. The matrix is cached and only rebuilt after a send changed.
+
+        """
+        return self._get_routing()[0]
+
+    def _get_routing(self):
+        """ Return the routing matrix and the columns with an open send for the busses and for the master. """
+        key = (self.dtype,) + tuple([bus.version for bus in self.busses + [self.master]])
+
+        if self._routing is None or self._routing[0] != key:
+            matrix = np.zeros((self.num_busses + 1, self.num_channels + self.num_busses))
+            for bus_idx, bus in enumerate(self.busses):
+                matrix[bus_idx,:self.num_channels] = bus.gains
+            matrix[self.num_busses] = self.master.gains
+            matrix[matrix <= SILENCE_THRESHOLD] = 0.0
+
+            matrix = matrix.astype(self.dtype)
+            matrix.flags.writeable = False # shared with clones
+
+            columns = (np.flatnonzero(np.any(matrix[:self.num_busses] != 0, axis=0)), np.flatnonzero(matrix[self.num_busses]))
+            self._routing = (key, matrix, columns)
+
+        return self._routing[1], self._routing[2]
+
+    def _mix_busses(self, mix_buffer, silent=None):
+        """ Mix the channels into the rows of the busses in `mix_buffer` and return which busses have a playing input. """
+        routing, (bus_cols, _) = self._get_routing()
+        inputs = mix_buffer.reshape(mix_buffer.shape[0], -1)
+        return self._mix(routing[:self.num_busses,:self.num_channels], bus_cols, inputs[:self.num_channels],
+                         silent, inputs[self.num_channels:])
+
+    @staticmethod
+    def _mix(routing, columns, inputs, silent, out):
+        """ Mix the inputs [inputs, samples * 2] into `out` [outputs, samples * 2] with one matrix product.
+
+        Only the `columns` of the routing gains [outputs, inputs] with an open send are 
+        used, leaving out the inputs that are flagged as `silent`. Returns for each output
+        whether an input with an open send is playing (always True without `silent`).
+
+        """
+        if silent is not None:
+            columns = columns[~silent[columns]]
 
-        return master_buffer
+        if len(columns) == routing.shape[1]:
+            np.matmul(routing, inputs, out=out)
+        else:
+            np.matmul(routing[:,columns], inputs[columns], out=out)
+
+        if silent is None:
+            return np.ones(routing.shape[0], dtype=bool)
+
+        return np.any(routing[:,columns] != 0, axis=1)
+
+    def _skip_silent_channels(self, block, ch_buffer):
+        """ Skip the idle channels with a silent input and return the silent flags of all mixer inputs.
+
+        The flags have one entry per channel followed by one per bus. Channels 
+        without an input in this block are silent, and skipped channels output zeros.
+
+        """
+        silent = np.ones(self.num_channels + self.num_busses, dtype=bool)
+        silent[:block.shape[1]] = np.max(np.abs(block), axis=0, initial=0.0) < SILENCE_THRESHOLD
+
+        for ch_idx in np.flatnonzero(silent[:block.shape[1]]):
+            if self.channels[ch_idx].is_idle():
+                self.channels[ch_idx].skip(block.shape[0])
+                ch_buffer[ch_idx] = 0.0
+            else: # the channel still has a tail to process
+                silent[ch_idx] = False
+
+        return silent
+
+    def _process_channel_batch(self, ch_idxs, block, ch_buffer):
+        """ Process the channels `ch_idxs` with the vectorized engine into their rows of `ch_buffer`. """
+        if len(ch_idxs) == 0:
+            return
+
+        channels = [self.channels[ch_idx] for ch_idx in ch_idxs]
+        start, stop = ch_idxs[0], ch_idxs[-1] + 1
+
+        if stop - start == len(ch_idxs): # a contiguous range of channels is written in place
+            Channel.process_batch(channels, block[:,start:stop], out=ch_buffer[start:stop])
+        else:
+            ch_buffer[ch_idxs] = Channel.process_batch(channels, block[:,ch_idxs])
+
+    def _process_threaded(self, block, mix_buffer, active, silent=None):
+        """ Run the channel and bus stages of `process_block()` on the thread pool. """
+        ch_buffer = mix_buffer[:self.num_channels]
+        executor = self._get_executor()
+
+        def process_channel(ch_idx):
+            ch_buffer[ch_idx] = self.channels[ch_idx].process(block[:,ch_idx])
+
+        # each task writes only its own rows of the buffer
+        if self.engine == "vectorized":
+            tasks = [executor.submit(self._process_channel_batch, ch_idxs, block, ch_buffer)
+                     for ch_idxs in np.array_split(active, min(self.num_threads, max(len(active), 1)))]
+        else:
+            tasks = [executor.submit(process_channel, ch_idx) for ch_idx in active]
+
+        for task in tasks:
+            task.result()
+
+        # the busses only process their own mixdown
+        playing = self._mix_busses(mix_buffer, silent)
+        tasks = [executor.submit(bus.process_mix, mix_buffer[self.num_channels+bus_idx], playing=playing[bus_idx])
+                 for bus_idx, bus in enumerate(self.busses)]
+
+        for task in tasks:
+            task.result()
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.num_threads)
+        return self._executor
+
+    def clone(self):
+        """ Return an independent copy of the console, e.g. to stamp out many consoles from a prototype.
+
+        The channels, busses, processor order, parameters and automation are copied,
+        while immutable data such as the reverb impulses and their spectra are shared
+        by reference. Every processor starts from a fresh DSP state, as after `reset()`.
+        This is much faster than constructing and configuring a new console.
+
+        Example
+        >>> prototype = Console(num_channels=8)
+        >>> consoles = [prototype.clone() for _ in range(100)]
+
+        """
+        clone = copy.copy(self)
+        clone.channels = [channel.clone() for channel in self.channels]
+        clone.busses   = [bus.clone() for bus in self.busses]
+        clone.master   = self.master.clone()
+
+        processors = {id(processor) : cloned for processor, cloned in zip(self.get_all_processors(), clone.get_all_processors())}
+        clone.automation = self.automation.clone(processors)
+
+        if getattr(self, "multitrack", None) is not None:
+            clone.multitrack = copy.copy(self.multitrack) # shares the audio but not the read position
+
+        clone.position  = 0
+        clone.keyframes = {}
+        clone._executor = None
+        clone._parameter_store = None
+        clone._parameter_store_key = None
+        clone._mix_buffer = None
+        clone._get_mix_buffer(self.block_size)
+
+        return clone
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_executor"] = None # the thread pool is recreated on first use
+        return state
+
+    def _get_mix_buffer(self, num_samples):
+        """ Return the work buffer for a block with `num_samples` samples.
+
+        The buffer has dimensions [channels + busses, samples, 2] and is only
+        reallocated when the number of samples in a block changes.
+
+        """
+        if self._mix_buffer is None or self._mix_buffer.shape[1] != num_samples:
+            self._mix_buffer = np.zeros((self.num_channels + self.num_busses, num_samples, 2), dtype=self.dtype)
+
+        return self._mix_buffer
 
     def downmix_multitrack_block(self, multitrack_block):
 
@@ -154,15 +627,115 @@ class Console:
 
     def reset(self):
         """ Clear all processor states """
-        pass
+        for processor in self.get_all_processors():
+            processor.reset_state()
+        self.position = 0
+
+    def automate(self, processor, parameter_name, times, values, interpolation=None):
+        """ Automate a parameter of one of the console processors.
+
+        The parameter follows a breakpoint curve with the given `values` at `times`
+        (in seconds since the last `reset()`). Gains and pans follow the curve per sample,
+        while other processors update their coefficients every `automation_block_size`
+        samples of the processor. No processor state is reset by automation.
+        Adding a lane for an already automated parameter replaces it.
+
+        Example fading in the first channel over two seconds
+        >>> fader = console.channels[0].post_processors.get("post-gain")
+        >>> console.automate(fader, "gain", [0.0, 2.0], [-24.0, 0.0])
+
+        """
+        return self.automation.add(processor, parameter_name, times, values, interpolation=interpolation)
+
+    def get_all_processors(self):
+        """ Return the processors of all channels, busses and the master bus. """
+        processors = []
+        for channel in self.channels:
+            processors += channel.get_all_processors()
+        for bus in self.busses:
+            processors += bus.processors.get_all()
+        processors += self.master.processors.get_all()
+
+        return processors
+
+    @contextmanager
+    def batch_update(self):
+        """ Defer the updates of every processor until the end of the `with` statement.
+
+        Parameters can be changed freely inside the context and each processor
+        recomputes its internal values (e.g. filter coefficients) only once on exit.
+        See `Processor.deferred()`.
+
+        Example
+        >>> with console.batch_update():
+        ...     console.randomize()
+        ...     console.master.processors.get("master-eq").parameters.low_shelf_gain.value = 3.0
+
+        """
+        with ExitStack() as stack:
+            for processor in self.get_all_processors():
+                stack.enter_context(processor.deferred())
+            yield self
 
     def randomize(self):
+        """ Shuffle the core processors of each channel and randomize all channel and bus parameters.
+
+        The parameters are drawn at once by the `parameter_store` and each processor is updated
+        once. The master bus and parameters with `randomize_value` disabled keep their values.
 
+        """
         for channel in self.channels:
-            channel.randomize()
+            channel.processors.shuffle()
 
-        for bus in self.busses:
-            bus.randomize()
+        store = self.parameter_store
+        store.randomize(where=self._randomize_mask)
+
+    @property
+    def parameter_store(self):
+        """ Return the `ParameterStore` holding the parameters of every processor and send.
+
+        Parameters are labeled "ch0/eq/low_shelf_gain", "bus1/sends/ch3-send", "master/master-eq/..." 
+        and ordered by channel, bus and master. The core processors of a channel are ordered by
+        name, so the layout does not change when they are shuffled. The store is rebuilt when
+        processors have been added or removed.
+
+        """
+        processors = self.get_all_processors()
+        key = frozenset([id(processor) for processor in processors])
+
+        if self._parameter_store is None or self._parameter_store_key != key:
+            parameters, labels = [], []
+
+            def add(prefix, parameter_list):
+                for name, parameter in parameter_list:
+                    parameters.append(parameter)
+                    labels.append(f"{prefix}/{name}")
+
+            for ch_idx, channel in enumerate(self.channels):
+                core = sorted(channel.processors.get_all(), key=lambda processor: processor.name)
+                for processor in channel.pre_processors.get_all() + core + channel.post_processors.get_all():
+                    add(f"ch{ch_idx}/{processor.name}", processor.parameters)
+            for bus_idx, bus in enumerate(self.busses):
+                for processor in bus.processors.get_all():
+                    add(f"bus{bus_idx}/{processor.name}", processor.parameters)
+                add(f"bus{bus_idx}/sends", bus.parameters)
+            for processor in self.master.processors.get_all():
+                add(f"master/{processor.name}", processor.parameters)
+
+            self._parameter_store = ParameterStore(parameters, labels=labels)
+            self._parameter_store_key = key
+            self._randomize_mask = np.array([not label.startswith("master/") for label in labels], dtype=bool)
+
+        return self._parameter_store
+
+    def vectorize(self):
+        """ Return the normalized values of all console parameters as one vector (see `ParameterStore`). """
+        return self.parameter_store.vectorize()
+
+    def devectorize(self, vector):
+        """ Set all console parameters from a vector created by `vectorize()`. """
+        store = self.parameter_store
+        store.set_values(store.devectorize(vector))
 
     def serialize(self, to_json=None, **kwargs):
 
@@ -185,6 +758,11 @@ class Console:
     
     def render_diagram(self, name="pymixconsole", filename="pymixconsole_diagram", show_parameters=True):
 
+        try:
+            from graphviz import Digraph
+        except ImportError:
+            raise ImportError("Rendering diagrams requires graphviz (pip install graphviz).")
+
         dot = Digraph(comment=name, graph_attr={'splines' : 'polyline', 'fontname' : 'Helvetica'})
 
         node_attr = {'fixedsize': 'false', 'width': '3', 'fontname' : 'Helvetica'}
@@ -258,11 +836,58 @@ class Console:
 
         return label
 
+    def get_state(self):
+        """ Capture the runtime DSP state of the whole console.
+
+        This holds the state of every processor (see `Processor.get_state()`) by its
+        label (e.g. "ch0/eq", "bus1/reverb", "master/master-compressor") and the 
+        automation position, but no parameters, impulses or coefficients.
+
+        """
+        return {"position"   : self.position,
+                "processors" : {label : processor.get_state() for label, processor in self.get_labeled_processors()}}
+
+    def set_state(self, state):
+        """ Restore a state captured with `get_state()` on a console with the same processors and settings. """
+        processors = dict(self.get_labeled_processors())
+        if set(processors.keys()) != set(state["processors"].keys()):
+            raise ValueError("State was captured on a console with different processors.")
+
+        for label, processor_state in state["processors"].items():
+            processors[label].set_state(processor_state)
+        self.position = state["position"]
+
+    def get_labeled_processors(self):
+        """ Return (label, processor) pairs for every processor, such as ("ch0/eq", eq). """
+        labeled_processors = []
+        for ch_idx, channel in enumerate(self.channels):
+            labeled_processors += [(f"ch{ch_idx}/{processor.name}", processor) for processor in channel.get_all_processors()]
+        for bus_idx, bus in enumerate(self.busses):
+            labeled_processors += [(f"bus{bus_idx}/{processor.name}", processor) for processor in bus.processors.get_all()]
+        labeled_processors += [(f"master/{processor.name}", processor) for processor in self.master.processors.get_all()]
+
+        return labeled_processors
+
     def save_parameters(self, filepath):
-        pass
+        """ Save the values of all parameters to a JSON file by their `parameter_store` label. """
+        store = self.parameter_store
+        with open(filepath, "w") as fp:
+            json.dump({label : parameter.value for label, parameter in zip(store.labels, store.parameters)}, fp, 
+                      cls=jsonencoder.CustomJSONEncoder, indent=2)
 
     def load_parameters(self, filepath):
-        pass
+        """ Load the parameters saved with `save_parameters()` (each processor is updated once). """
+        store = self.parameter_store
+        with open(filepath, "r") as fp:
+            parameters = json.load(fp)
+
+        values = store.values.copy()
+        for label, value in parameters.items():
+            idx = store.index(label)
+            store.parameters[idx].check_value(value)
+            values[idx] = store.parameters[idx].encode(value)
+
+        store.set_values(values)
 
     def save(self, filepath):
         """ Save the entire console object along with parameter settings and processor state. 
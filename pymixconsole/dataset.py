@@ -0,0 +1,108 @@
+""" Parallel generation of randomized mixes.
+
+Each worker process builds its consoles once and then repeatedly randomizes
+and renders them, writing the mix and its serialized parameters to disk.
+
+Example for 1000 mixes of a set of multitracks on all cores
+>>> stats = generate_dataset(multitracks, 1000, "mixes/")
+>>> print(f"{stats['mixes_per_second']:0.1f} mixes/s")
+
+"""
+import os
+import time
+import random
+import multiprocessing
+import numpy as np
+
+from .console import Console
+from .util import logger
+
+# state of each worker process (set by the pool initializer)
+_worker = {}
+
+def _init_worker(multitracks, output_dir, console_kwargs):
+    _worker["multitracks"]    = multitracks
+    _worker["output_dir"]     = output_dir
+    _worker["console_kwargs"] = console_kwargs
+    _worker["consoles"]       = {}
+
+def _get_console(multitrack):
+    """ Return the console of this worker for the layout of `multitrack`, building it on first use. """
+    key = (multitrack.num_channels, multitrack.block_size, multitrack.rate)
+
+    if key not in _worker["consoles"]:
+        _worker["consoles"][key] = Console(block_size=multitrack.block_size,
+                                           sample_rate=multitrack.rate,
+                                           num_channels=multitrack.num_channels,
+                                           **_worker["console_kwargs"])
+
+    return _worker["consoles"][key]
+
+def _render_mix(job):
+    mix_idx, mt_idx, seed = job
+    multitrack = _worker["multitracks"][mt_idx]
+    console = _get_console(multitrack)
+
+    # randomize the console and clear the state left by the previous mix
+    np.random.seed(seed)
+    random.seed(seed)
+    console.randomize()
+    console.reset()
+
+    filename = os.path.join(_worker["output_dir"], f"mix_{mix_idx:06d}")
+    num_samples = console.render_to_file(multitrack, filename + ".wav")
+    console.serialize(to_json=filename + ".json")
+
+    return mix_idx, num_samples / multitrack.rate
+
+def generate_dataset(multitracks, num_mixes, output_dir, num_workers=None, seed=0, **console_kwargs):
+    """ Render `num_mixes` randomized mixes of a list of multitracks in parallel.
+
+    Mix `i` uses `multitracks[i % len(multitracks)]` and is randomized with
+    the seed `seed + i`, so the dataset is the same for any number of workers.
+    For each mix a 32 bit float `mix_XXXXXX.wav` file and a `mix_XXXXXX.json` file
+    with the serialized console parameters are written to `output_dir`.
+
+    multitracks (list): Multitrack objects with their audio data loaded
+    num_mixes (int): Number of mixes to generate
+    output_dir (str): Directory for the output files (created if needed)
+    num_workers (int): Number of worker processes (defaults to the number of cores)
+    seed (int): Seed of the first mix
+    console_kwargs: Additional arguments when creating each console (e.g. `engine`)
+
+    Returns a dict with the number of mixes, the elapsed time, the throughput
+    in mixes per second and the real-time factor (seconds of audio per second).
+
+    """
+    log = logger.getLog(logger.LOG_NAME)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if num_workers is None:
+        num_workers = os.cpu_count()
+
+    jobs = [(mix_idx, mix_idx % len(multitracks), seed + mix_idx) for mix_idx in range(num_mixes)]
+    audio_seconds = 0.0
+    start = time.perf_counter()
+
+    if num_workers <= 1:
+        _init_worker(multitracks, output_dir, console_kwargs)
+        for job in jobs:
+            audio_seconds += _render_mix(job)[1]
+    else:
+        with multiprocessing.Pool(num_workers, initializer=_init_worker, initargs=(multitracks, output_dir, console_kwargs)) as pool:
+            chunksize = max(1, num_mixes // (num_workers * 4))
+            for mix_idx, duration in pool.imap_unordered(_render_mix, jobs, chunksize=chunksize):
+                audio_seconds += duration
+
+    elapsed = time.perf_counter() - start
+
+    stats = {"num_mixes"        : num_mixes,
+             "num_workers"      : num_workers,
+             "elapsed"          : elapsed,
+             "mixes_per_second" : num_mixes / elapsed,
+             "realtime_factor"  : audio_seconds / elapsed}
+
+    log.info(f"generated {num_mixes} mixes in {elapsed:0.2f} s "
+             f"({stats['mixes_per_second']:0.2f} mixes/s, {stats['realtime_factor']:0.1f}x real-time)")
+
+    return stats
@@ -1,15 +1,30 @@
+import queue
 import warnings
+import threading
 import numpy as np
 
 class Multitrack():
-    """ Multitrack audio object 
-    
-    Load audio either directly as a numpy array with shape [samples, channels].
+    """ Multitrack audio object
+
+    Load audio either directly as a numpy array with shape [samples, channels],
+    or from a list of stem files (WAV).
+
+    All channels of an array must have the same number of samples.
+
+    Stem files are never loaded as a whole. Each file is memory-mapped and
+    only the requested samples are read and converted to float, with every
+    channel of a multichannel stem becoming one channel of the multitrack.
+    Stems shorter than the longest one are padded with zeros on the fly.
+    When iterating, blocks are read ahead in chunks of `read_ahead_size`
+    samples on a background thread.
+
+    Example streaming a session from stems
+    >>> multitrack = Multitrack(files=["drums.wav", "bass.wav", "vocals.wav"], block_size=512)
+    >>> console = Console(multitrack=multitrack)
+    >>> out = console.render()
 
-    All channels must have the same number of samples.
-    
     """
-    def __init__(self, data=None, files=None, num_channels=1, rate=44100, block_size=512, current_index=0):
+    def __init__(self, data=None, files=None, num_channels=1, rate=44100, block_size=512, current_index=0, read_ahead_size=65536, read_ahead_chunks=4):
         self.data          = data
         self.files         = files
         self.num_channels  = num_channels
@@ -18,74 +33,179 @@ class Multitrack():
 
         self.rate = rate # deal with this later
 
-        # if files are given load them
-        #if self.files is not None:
-        #    self._load_tracks_from_file()
-        #else:
-        #    self._load_tracks_from_array()
+        # number of samples per read and number of chunks buffered by the read-ahead thread
+        self.read_ahead_size   = max(block_size, (read_ahead_size // block_size) * block_size)
+        self.read_ahead_chunks = read_ahead_chunks
+        self._stream = None
 
-        self._load_tracks_from_array()
+        # if files are given load them
+        if self.files is not None:
+            self._load_tracks_from_file()
+        elif self.data is not None:
+            self._load_tracks_from_array()
+        else:
+            self.num_samples = 0
+            warnings.warn("No multitrack data was loaded.")
 
         # calculate number of full blocks
         self.num_blocks = int(np.floor(self.num_samples / self.block_size))
 
-        if self.data is None and self.files is None:
-            warnings.warn("No multitrack data was loaded.")
-
     def __iter__(self):
         return self
 
     def __next__(self):
         next_index = self.current_index + self.block_size
 
-        if next_index <= self.num_samples:
-            self.current_index += self.block_size
-        else:
+        if next_index > self.num_samples:
             raise StopIteration
 
-        return self.data[self.current_index-self.block_size:self.current_index,:]
-    
+        if self.files is None:
+            self.current_index += self.block_size
+            return self.data[self.current_index-self.block_size:self.current_index,:]
+
+        # (re)start the read-ahead stream if it is not positioned at the current index
+        if self._stream is None or self._stream_index != self.current_index:
+            self._stream = self._iter_blocks(self.current_index)
+
+        block = next(self._stream)
+        self.current_index += self.block_size
+        self._stream_index = self.current_index
+
+        return block
+
     def __repr__(self):
-        pass
+        return f"Multitrack({self.num_channels} channels, {self.num_samples} samples, {self.rate} Hz)"
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_stream"] = None
+        if self.files is not None:
+            state["_stems"] = None # memory maps are reopened when unpickled
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.files is not None:
+            self._stems = [self._open_stem(track_file) for track_file in self.files]
+
+    def read(self, start, stop):
+        """ Return the samples from `start` to `stop` of all channels as a [samples, channels] array. """
+        stop = min(stop, self.num_samples)
+
+        if self.files is None:
+            return self.data[start:stop,:]
+
+        block = np.zeros((max(stop - start, 0), self.num_channels))
+        ch_idx = 0
+
+        for stem in self._stems:
+            n_channels = 1 if stem.ndim == 1 else stem.shape[1]
+            stem_stop = min(stop, stem.shape[0])
+
+            if stem_stop > start:
+                samples = _to_float(stem[start:stem_stop])
+                block[:stem_stop-start, ch_idx:ch_idx+n_channels] = samples.reshape(stem_stop - start, n_channels)
+
+            ch_idx += n_channels
+
+        return block
+
+    def iter_chunks(self, chunk_size, start=0, stop=None):
+        """ Iterate over the samples from `start` to `stop` in chunks of `chunk_size` samples.
+
+        For stem files each chunk is read by a background thread while
+        the previous chunks are being processed, with up to `read_ahead_chunks`
+        chunks waiting. Arrays are returned directly as views.
+
+        """
+        if stop is None:
+            stop = self.num_samples
+
+        if self.files is None:
+            for chunk_start in range(start, stop, chunk_size):
+                yield self.data[chunk_start:min(chunk_start + chunk_size, stop),:]
+            return
+
+        chunks = queue.Queue(maxsize=self.read_ahead_chunks)
+        done = threading.Event()
+
+        def put(item):
+            while not done.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def reader():
+            try:
+                for chunk_start in range(start, stop, chunk_size):
+                    if not put(self.read(chunk_start, min(chunk_start + chunk_size, stop))):
+                        return
+            except Exception as e:
+                put(e)
+            put(None)
+
+        thread = threading.Thread(target=reader, daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                chunk = chunks.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            done.set()
+
+    def _iter_blocks(self, start):
+        """ Yield the full blocks from `start` on, read ahead in large chunks. """
+        stop = start + ((self.num_samples - start) // self.block_size) * self.block_size
+
+        for chunk in self.iter_chunks(self.read_ahead_size, start=start, stop=stop):
+            for idx in range(0, chunk.shape[0], self.block_size):
+                yield chunk[idx:idx+self.block_size]
+
+    def _open_stem(self, track_file):
+        from scipy.io import wavfile
+
+        try:
+            track_rate, track_data = wavfile.read(track_file, mmap=True)
+        except ValueError: # formats that cannot be memory-mapped (e.g. 24 bit) are read into memory
+            track_rate, track_data = wavfile.read(track_file)
+
+        if track_rate != self.rate:
+            raise RuntimeError(f"Track has fs={track_rate}, but project has fs={self.rate}.")
+
+        return track_data
 
-    def _determine_array_size_from_file(self, files):
+    def _determine_array_size_from_file(self, stems):
 
         max_num_samples    = 0
         total_num_channels = 0
 
-        for track_file in files:
-            track_data, track_rate = sf.read(track_file) # load audio (with shape (samples, channels))
-
+        for track_data in stems:
             max_num_samples     = np.max([max_num_samples, track_data.shape[0]])
             total_num_channels  += track_data.shape[1] if len(track_data.shape) > 1 else 1
-        
+
         return [max_num_samples, total_num_channels]
 
-    #def _load_tracks_from_file(self):
-    #
-    #    self.num_samples, self.num_channels = self._determine_array_size_from_file(self.files)
-    #
-    #    self.data = np.empty([self.num_samples, self.num_channels])
-    #
-    #    self.loaded_channels = 0
-    #    
-    #    for track_file in self.files:
-    #        track_data, track_rate = sf.read(track_file) # load audio (with shape (samples, channels))
-    #
-    #        pad_size = self.num_samples - track_data.shape[0]
-    #        
-    #        if track_rate != self.rate:
-    #            raise RuntimeError(f"Track has fs={track_rate}, but project has fs={self.rate}.")
-    #
-    #        if len(track_data.shape) > 1:
-    #            for ch in range(track_data.shape[1]):
-    #
-    #                self.data[:,self.loaded_channels] = np.pad(track_data[:,ch], (0,pad_size), 'constant')
-    #                self.loaded_channels += 1
-    #        else:
-    #            self.data[:,self.loaded_channels] = np.pad(track_data, (0,pad_size), 'constant')
-    #            self.loaded_channels += 1
+    def _load_tracks_from_file(self):
+        self._stems = [self._open_stem(track_file) for track_file in self.files]
+        self.num_samples, self.num_channels = self._determine_array_size_from_file(self._stems)
 
     def _load_tracks_from_array(self):
         self.num_channels = self.data.shape[1]
         self.num_samples  = self.data.shape[0]
+
+def _to_float(samples):
+    """ Convert PCM samples to floating point in [-1, 1). """
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float64) - 128) / 128
+    elif np.issubdtype(samples.dtype, np.integer):
+        return samples.astype(np.float64) / (2 ** (8 * samples.dtype.itemsize - 1))
+    else:
+        return np.asarray(samples, dtype=np.float64)
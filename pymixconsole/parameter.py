@@ -13,7 +13,7 @@ class Parameter(object):
 
         self.kind  = kind
         self.name  = name
-        self.hold  = False
+        self._store = None # see `bind()`
         if processor:
             self.processor = processor
         else:
@@ -73,7 +73,7 @@ class Parameter(object):
     def reset(self):
         self.value = self._default
 
-    def randomize(self, distribution="default", hold=False):
+    def randomize(self, distribution="default"):
         """ Randomize the value of a parameter.
 
         By default this will select a value from a uniform distribution 
@@ -140,23 +140,65 @@ class Parameter(object):
 
     @property
     def value(self):
+        if self._store is not None:
+            return self.decode(self._store.values[self._store_index])
         return self._value
     
     @value.setter
     def value(self, value):
         self.check_value(value)
-        self._value = value
+        if self._store is not None:
+            self._store.values[self._store_index] = self.encode(value)
+        else:
+            self._value = value
 
         # if there is a processor reference call its update method
         # but only if we have added all parameters first?
-        if self.processor and hasattr(self.processor.parameters, self.name) and not self.hold:
+        # updates are collected instead while the processor is deferred
+        if self.processor and hasattr(self.processor.parameters, self.name):
             #log = logger.getLog(logger.LOG_NAME)
             #if self.kind == "float":
             #    s = f"changing {self.processor.name} {self.name} to {value:.{self.print_precision}f} {self.units}"
             #else:
             #    s = f"changing {self.name} to {value}."
             #log.info(s)
-            self.processor.update(self.name)
+            if getattr(self.processor, "is_deferred", False):
+                self.processor.mark_dirty(self.name)
+            else:
+                self.processor.update(self.name)
+
+    def clone(self, processor=None):
+        """ Return a copy of the parameter for `processor` that stores its own value. """
+        parameter = Parameter.__new__(Parameter)
+        parameter.__dict__.update(self.__dict__)
+        parameter._value = self.value
+        parameter._store = None
+        parameter.processor = processor
+        return parameter
+
+    def bind(self, store, index):
+        """ Keep the value in element `index` of a `ParameterStore` from now on. """
+        value = self.value
+        self._store = store
+        self._store_index = index
+        self._store.values[index] = self.encode(value)
+
+    def encode(self, value):
+        """ Return the value as a number (bools as 0 or 1, strings as the option index). """
+        if self.kind == "string":
+            return float(self.options.index(value))
+        return float(value)
+
+    def decode(self, value):
+        """ Return the value of this kind for a number produced by `encode()`. """
+        if self.kind == "float":
+            return float(value)
+        elif self.kind == "int":
+            return int(value)
+        elif self.kind == "bool":
+            return bool(value)
+        else:
+            return self.options[int(value)]
 
     def serialize(self, normalize=False, one_hot_encode=False):
         if self.kind in ["float", "int"]:
@@ -22,6 +22,18 @@ class ParameterList():
         if hasattr(self, parameter.name):
             raise ValueError("parameter names must be unique!")
 
+    def clone(self, processors={}):
+        """ Return a list with copies of all parameters, unbound from any `ParameterStore`.
+
+        Parameters of a processor in `processors` (a dict from `id()` of the original
+        to the new processor) are attached to the new processor.
+
+        """
+        parameter_list = ParameterList()
+        for name, parameter in self:
+            setattr(parameter_list, name, parameter.clone(processor=processors.get(id(parameter.processor), parameter.processor)))
+        return parameter_list
+
     def serialize(self, **kwargs):
         serialized_parameters = {}
         for name, parameter in self:
@@ -0,0 +1,237 @@
+import numpy as np
+
+from .parameter import kinds
+
+class ParameterStore():
+    """ Struct-of-arrays storage for the parameters of many processors.
+
+    The values of all parameters are kept in one array along with their
+    ranges, distributions and the layout of their normalized vector, so that
+    whole sets of parameters can be randomized, vectorized and devectorized
+    with a few numpy operations instead of a loop over the parameters.
+
+    Every parameter added to the store is bound to it: reading and setting
+    `parameter.value` goes through the store array, so the store and the
+    processors always agree. Values are encoded as numbers, with bools as 0 or 1
+    and strings as the index of the option. Ranges, distributions and the
+    `randomize_value` flags are read once when the store is created.
+
+    The normalized vector follows `Processor.vectorize()`: float and int values
+    are scaled to [-1, 1], bools are 0 or 1, and strings are one-hot encoded.
+
+    parameters (list): Parameter objects to store
+    labels (list): Optional name for each parameter (e.g. "ch0/eq/low_shelf_gain")
+
+    Example drawing the labels for many random configurations at once
+    >>> store = console.parameter_store
+    >>> values = store.sample(100000)
+    >>> vectors = store.vectorize(values)
+
+    """
+    def __init__(self, parameters, labels=None):
+
+        self.parameters = list(parameters)
+        self.labels = labels if labels is not None else [parameter.name for parameter in self.parameters]
+        num_parameters = len(self.parameters)
+
+        self.kinds      = np.array([kinds.index(parameter.kind) for parameter in self.parameters], dtype=np.int64)
+        self.minimum    = np.zeros(num_parameters)
+        self.maximum    = np.zeros(num_parameters)
+        self.mu         = np.zeros(num_parameters)
+        self.sigma      = np.zeros(num_parameters)
+        self.p          = np.full(num_parameters, 0.5)
+        self.normal     = np.zeros(num_parameters, dtype=bool)
+        self.randomizable = np.array([parameter.randomize_value for parameter in self.parameters], dtype=bool)
+
+        # position and width of each parameter in the normalized vector
+        self.widths = np.ones(num_parameters, dtype=np.int64)
+
+        for idx, parameter in enumerate(self.parameters):
+            if parameter.kind in ["float", "int", "string"]:
+                self.minimum[idx] = parameter.min
+                self.maximum[idx] = parameter.max
+            if parameter.kind == "float" and hasattr(parameter, "mu") and hasattr(parameter, "sigma"):
+                self.normal[idx] = True
+                self.mu[idx]     = parameter.mu
+                self.sigma[idx]  = parameter.sigma
+            if parameter.kind == "bool" and hasattr(parameter, "p"):
+                self.p[idx] = parameter.p
+            if parameter.kind == "string":
+                self.widths[idx] = len(parameter.options)
+
+        self.offsets = np.concatenate(([0], np.cumsum(self.widths)[:-1])).astype(np.int64)
+        self.vector_size = int(np.sum(self.widths))
+
+        self._float  = self.kinds == kinds.index("float")
+        self._int    = self.kinds == kinds.index("int")
+        self._bool   = self.kinds == kinds.index("bool")
+        self._string = self.kinds == kinds.index("string")
+        self._scaled = self._float | self._int
+
+        # one-hot slots of the string parameters, padded with -1 to the largest number of options
+        self._string_idxs = np.flatnonzero(self._string)
+        max_options = np.max(self.widths[self._string_idxs], initial=1)
+        self._onehot = np.full((self._string_idxs.shape[0], max_options), -1, dtype=np.int64)
+        for row, idx in enumerate(self._string_idxs):
+            self._onehot[row,:self.widths[idx]] = self.offsets[idx] + np.arange(self.widths[idx])
+
+        # processors to update when their parameters change
+        self._processors = []
+        self._processor_idxs = np.full(num_parameters, -1, dtype=np.int64)
+        processor_idxs = {}
+        for idx, parameter in enumerate(self.parameters):
+            if parameter.processor is not None:
+                if id(parameter.processor) not in processor_idxs:
+                    processor_idxs[id(parameter.processor)] = len(self._processors)
+                    self._processors.append(parameter.processor)
+                self._processor_idxs[idx] = processor_idxs[id(parameter.processor)]
+
+        # move the current values into the store
+        self.values = np.array([parameter.encode(parameter.value) for parameter in self.parameters], dtype=np.float64)
+        for idx, parameter in enumerate(self.parameters):
+            parameter.bind(self, idx)
+
+    def __len__(self):
+        return len(self.parameters)
+
+    def __repr__(self):
+        return f"ParameterStore({len(self)} parameters, vector size {self.vector_size})"
+
+    def index(self, label):
+        """ Return the position of the parameter with the given label. """
+        return self.labels.index(label)
+
+    def sample(self, num_sets=None, where=None):
+        """ Draw random values for all parameters from their distributions.
+
+        Float parameters with `mu` and `sigma` are drawn from a normal distribution
+        clipped to their range and all others uniformly, as in `Parameter.randomize()`.
+        Parameters that are not randomizable (or not selected by the boolean mask `where`)
+        keep their current value.
+
+        Returns an array with the encoded values, with dimensions [parameters],
+        or [num_sets, parameters] if `num_sets` is given.
+
+        """
+        shape = () if num_sets is None else (num_sets,)
+        values = np.empty(shape + (len(self),))
+        values[...] = self.values
+
+        randomize = self.randomizable if where is None else self.randomizable & where
+        span = self.maximum - self.minimum
+
+        # draw only the columns of each kind of distribution
+        cols = np.flatnonzero(randomize & self.normal)
+        values[...,cols] = np.clip(self.mu[cols] + self.sigma[cols] * np.random.randn(*shape, cols.shape[0]),
+                                   self.minimum[cols], self.maximum[cols])
+
+        cols = np.flatnonzero(randomize & self._float & ~self.normal)
+        values[...,cols] = self.minimum[cols] + np.random.rand(*shape, cols.shape[0]) * span[cols]
+
+        # ints are drawn from [min, max) and strings from all options
+        cols = np.flatnonzero(randomize & self._int & (span > 0))
+        values[...,cols] = self.minimum[cols] + np.floor(np.random.rand(*shape, cols.shape[0]) * span[cols])
+
+        cols = np.flatnonzero(randomize & self._string)
+        values[...,cols] = np.floor(np.random.rand(*shape, cols.shape[0]) * self.widths[cols])
+
+        cols = np.flatnonzero(randomize & self._bool)
+        values[...,cols] = np.random.rand(*shape, cols.shape[0]) < self.p[cols]
+
+        return values
+
+    def randomize(self, where=None):
+        """ Set all randomizable parameters (optionally only those in the mask `where`) to random values. """
+        self.set_values(self.sample(where=where))
+
+    def vectorize(self, values=None):
+        """ Return the normalized vector of the current values, or of the encoded `values`.
+
+        `values` can have dimensions [parameters] or [sets, parameters] and the
+        result then has dimensions [vector_size] or [sets, vector_size].
+
+        """
+        values = self.values if values is None else np.asarray(values, dtype=np.float64)
+
+        vector = np.zeros(values.shape[:-1] + (self.vector_size,))
+
+        # floats and ints are scaled to [-1, 1] (or 0 without a range) and bools are copied
+        span = self.maximum - self.minimum
+        cols = np.flatnonzero(self._scaled & (span > 0))
+        vector[...,self.offsets[cols]] = (values[...,cols] - self.minimum[cols]) / span[cols] * 2 - 1
+        cols = np.flatnonzero(self._bool)
+        vector[...,self.offsets[cols]] = values[...,cols]
+
+        if self._string_idxs.shape[0] > 0:
+            slots = self.offsets[self._string_idxs] + values[...,self._string_idxs].astype(np.int64)
+            np.put_along_axis(vector.reshape(-1, self.vector_size), slots.reshape(-1, slots.shape[-1]), 1.0, axis=-1)
+
+        return vector
+
+    def devectorize(self, vector):
+        """ Return the encoded values for a normalized vector (the inverse of `vectorize()`).
+
+        Scaled values are clipped to the parameter range, ints are rounded,
+        bools are set above 0.5 and strings take the largest one-hot entry.
+
+        """
+        vector = np.asarray(vector, dtype=np.float64)
+        if vector.shape[-1] != self.vector_size:
+            raise ValueError(f"Vector has {vector.shape[-1]} elements, but the store expects {self.vector_size}.")
+
+        scalar = vector[...,self.offsets]
+
+        span = self.maximum - self.minimum
+        values = np.clip(self.minimum + (scalar + 1) / 2 * span, self.minimum, self.maximum)
+        values = np.where(self._int, np.rint(values), values)
+        values = np.where(self._bool, scalar > 0.5, values)
+
+        if self._string_idxs.shape[0] > 0:
+            onehot = np.where(self._onehot >= 0, vector[...,np.maximum(self._onehot, 0)], -np.inf)
+            values[...,self._string_idxs] = np.argmax(onehot, axis=-1)
+
+        return values
+
+    def set_values(self, values):
+        """ Set all parameters from encoded values and update the processors that changed.
+
+        Each processor is updated once, with the parameter name if only one of its
+        parameters changed (or marked dirty if its updates are deferred).
+
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape != self.values.shape:
+            raise ValueError(f"Expected {self.values.shape[0]} values, got an array with shape {values.shape}.")
+
+        invalid = (self._scaled | self._string) & ((values < self.minimum) | (values > self.maximum))
+        invalid |= self._bool & (values != 0) & (values != 1)
+        if np.any(invalid):
+            idx = np.flatnonzero(invalid)[0]
+            raise ValueError(f"Invalid value {values[idx]} for {self.labels[idx]}.")
+
+        changed = np.flatnonzero(values != self.values)
+        self.values[:] = values
+
+        changed = changed[self._processor_idxs[changed] >= 0]
+        for processor_idx in np.unique(self._processor_idxs[changed]):
+            processor = self._processors[processor_idx]
+            names = [self.parameters[idx].name for idx in changed[self._processor_idxs[changed] == processor_idx]]
+            if processor.is_deferred:
+                for name in names:
+                    processor.mark_dirty(name)
+            else:
+                processor.update(names[0] if len(names) == 1 else None)
+
+    def get_value(self, index):
+        """ Return the value of the parameter at `index` in its own kind. """
+        return self.parameters[index].decode(self.values[index])
+
+    def vector_labels(self):
+        """ Return a label for each element of the normalized vector. """
+        labels = []
+        for label, parameter in zip(self.labels, self.parameters):
+            if parameter.kind == "string":
+                labels += [f"{label}={option}" for option in parameter.options]
+            else:
+                labels.append(label)
+        return labels
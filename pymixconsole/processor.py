@@ -1,14 +1,34 @@
+import copy
 import numpy as np
 from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+# signals below this level (-120 dB) are treated as silence
+SILENCE_THRESHOLD = 1e-6
 
 class Processor(ABC):
-    def __init__(self, name, parameters, block_size, sample_rate, dtype="float32"):
+
+    # names of the attributes that hold the runtime DSP state (see `get_state()`)
+    state_attributes = []
+
+    def __init__(self, name, parameters, block_size, sample_rate, dtype="float64"):
         
         self.name        = name
+        self.dtype       = dtype
         self.parameters  = parameters
         self.block_size  = block_size
         self.sample_rate = sample_rate
-        self.dtype       = dtype
+
+        # parameter changes collected while updates are deferred
+        self._deferred = 0
+        self._dirty    = []
+
+        # consecutive silent input samples (see `is_idle()`), a new processor has no tail
+        self._silent_samples = np.inf
+
+        # per-sample parameter curves for the next block (see `automate()`)
+        self._automation = {}
+        self.automation_block_size = 32
 
         if not np.log2(block_size).is_integer():
             raise ValueError(f"Processor block size {block_size} must be a power of 2.")
@@ -21,6 +41,78 @@ class Processor(ABC):
     def update(self, parameter_name):
         pass
 
+    @classmethod
+    def process_batch(cls, processors, data):
+        """ Apply one processor per channel to a multichannel block.
+
+        The input block has dimensions [samples, channels] for mono
+        signals or [samples, 2, channels] for stereo signals, where
+        the last axis follows the order of `processors`.
+
+        This default implementation calls `process()` on each channel in turn.
+        Processors that can operate on per-channel parameter vectors override
+        it with a vectorized kernel. If some channels come out stereo and others
+        mono, the mono channels are copied to both sides.
+
+        """
+        outputs = []
+        for ch_idx, processor in enumerate(processors):
+            outputs.append(processor.process(np.ascontiguousarray(data[...,ch_idx])))
+
+        if all([output.ndim == 1 for output in outputs]):
+            return np.stack(outputs, axis=-1)
+
+        for idx, output in enumerate(outputs):
+            if output.ndim == 1:
+                output = np.expand_dims(output, 1)
+            if output.shape[1] == 1:
+                output = np.repeat(output, 2, axis=1)
+            outputs[idx] = output
+
+        return np.stack(outputs, axis=-1)
+
+    def automate(self, parameter_name, values):
+        """ Set per-sample values of a parameter for the next processed block.
+
+        The next call to `process_automated()` consumes the curve,
+        which must have one value per sample of that block.
+
+        """
+        self._automation[parameter_name] = values
+
+    @property
+    def is_automated(self):
+        return len(self._automation) > 0
+
+    def process_automated(self, data):
+        """ Process a block while following the parameter curves set with `automate()`.
+
+        This default implementation splits the block into sub-blocks of
+        `automation_block_size` samples and sets the parameters to their value
+        at the start of each sub-block, so that coefficients follow the curves at
+        the sub-block rate. Processors can override it to apply curves per sample.
+        The processor state is carried across sub-blocks and never reset.
+
+        """
+        automation = self._automation
+        self._automation = {}
+
+        outputs = []
+        for start in range(0, data.shape[0], self.automation_block_size):
+            stop = min(start + self.automation_block_size, data.shape[0])
+
+            with self.deferred():
+                for parameter_name, values in automation.items():
+                    parameter = getattr(self.parameters, parameter_name)
+                    value = values[start].item() if isinstance(values[start], np.generic) else values[start]
+                    if parameter.value != value:
+                        parameter.value = value
+
+            # copy since some processors reuse their output buffer
+            outputs.append(np.array(self.process(data[start:stop])))
+
+        return np.concatenate(outputs)
+
     def set(self, config):
         for parameter_name, settings in config.items():
             parameter = getattr(self.parameters, parameter_name)
@@ -28,15 +120,155 @@ class Processor(ABC):
                 setattr(parameter, setting_name, value)
 
     def reset(self):
-        for name, parameter in self.parameters:
-            parameter.reset()
+        with self.deferred():
+            for name, parameter in self.parameters:
+                parameter.reset()
+
+    def reset_state(self):
+        """ Clear the internal DSP state (e.g. filter states and delay lines). """
+        pass
+
+    def clone(self):
+        """ Return a copy of the processor with the same parameters and a fresh DSP state.
+
+        The parameters, coefficients and containers (e.g. filter objects) are copied, 
+        while read-only arrays (such as the impulses shared through `util.irbank`) are
+        shared by reference. The state attributes are not copied but reallocated.
+
+        """
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+
+        for name, value in self.__dict__.items():
+            if name in ["_parameters", "_dirty", "_automation"]:
+                continue
+            elif isinstance(value, np.ndarray):
+                if value.flags.writeable and name not in self.state_attributes:
+                    setattr(clone, name, value.copy())
+            elif isinstance(value, (dict, list, tuple, set)):
+                setattr(clone, name, copy.deepcopy(value))
+
+        if self.parameters is not None:
+            clone._parameters = self.parameters.clone(processors={id(self) : clone})
+
+        clone._deferred = 0
+        clone._dirty    = []
+        clone._automation = {}
+        clone.reset_state()
+        clone._silent_samples = np.inf
+
+        return clone
+
+    def get_state(self):
+        """ Return a copy of the runtime DSP state (e.g. filter states and delay lines).
+
+        Only the attributes listed in `state_attributes` are captured, not the 
+        parameters or anything derived from them (coefficients, impulses), so the state
+        is small and can be restored with `set_state()` on a processor with the same settings.
+
+        """
+        return {name : np.copy(getattr(self, name)) if isinstance(getattr(self, name), np.ndarray) else getattr(self, name)
+                for name in self.state_attributes}
+
+    def set_state(self, state):
+        """ Restore a state captured with `get_state()`. """
+        for name, value in state.items():
+            if isinstance(value, np.ndarray):
+                current = getattr(self, name)
+                if current.shape != value.shape:
+                    raise ValueError(f"State '{name}' of {self.name} has shape {value.shape}, expected {current.shape}.")
+                value = value.astype(current.dtype, copy=True)
+            setattr(self, name, value)
+
+    @property
+    def tail_length(self):
+        """ Number of samples the output can continue after the input falls silent. """
+        return 0
+
+    def is_idle(self):
+        """ Return True if silent input would currently produce silent output.
+
+        Processors with internal state (e.g. filters, delay lines and reverbs)
+        are idle once their state or tail has decayed below `SILENCE_THRESHOLD`.
+
+        """
+        return True
+
+    def skip(self, num_samples):
+        """ Advance the processor over `num_samples` of silence without processing.
+
+        This is called instead of `process()` when the input is silent and the
+        processor is idle, and the output is taken to be silent. Processors whose
+        state still evolves on silence (e.g. a compressor releasing) update it here.
+        Pending automation curves are consumed by setting their final values.
+
+        """
+        if self.is_automated:
+            automation = self._automation
+            self._automation = {}
+            with self.deferred():
+                for parameter_name, values in automation.items():
+                    value = values[-1].item() if isinstance(values[-1], np.generic) else values[-1]
+                    getattr(self.parameters, parameter_name).value = value
+
+    def _count_silence(self, data):
+        """ Count the consecutive silent input samples (used by processors with a tail).
+
+        Processors with a tail call this in `process()`, set the count to infinity when
+        their state is cleared, and are idle once the count reaches their tail length.
+
+        """
+        if data.size == 0 or np.max(np.abs(data)) < SILENCE_THRESHOLD:
+            self._silent_samples += data.shape[0]
+        else:
+            self._silent_samples = 0
 
     def randomize(self, **kwargs):
-        for name, parameter in self.parameters:
-            if parameter.randomize_value:
-                parameter.hold = True # hold updates til end
-                parameter.randomize()
-        self.update(None)
+        with self.deferred():
+            for name, parameter in self.parameters:
+                if parameter.randomize_value:
+                    parameter.randomize()
+
+    @contextmanager
+    def deferred(self):
+        """ Collect parameter changes and run `update()` once at the end.
+
+        Inside the context assigning a parameter value only marks it as dirty.
+        On exit `update()` is called with the parameter name if one parameter
+        changed, with None if several changed, and not at all if none did.
+        Contexts can be nested, the update runs when the outermost one exits.
+
+        Example setting up an equaliser band with a single coefficient update
+        >>> with eq.deferred():
+        ...     eq.parameters.first_band_gain.value = 6.0
+        ...     eq.parameters.first_band_freq.value = 800.0
+
+        """
+        self._deferred += 1
+        try:
+            yield self
+        finally:
+            self._deferred -= 1
+            if self._deferred == 0:
+                self.commit()
+
+    def commit(self):
+        """ Run the update for all parameters changed while deferred. """
+        dirty = self._dirty
+        self._dirty = []
+
+        if len(dirty) == 1:
+            self.update(dirty[0])
+        elif len(dirty) > 1:
+            self.update(None)
+
+    def mark_dirty(self, parameter_name):
+        if parameter_name not in self._dirty:
+            self._dirty.append(parameter_name)
+
+    @property
+    def is_deferred(self):
+        return self._deferred > 0
 
     def serialize(self):
         """ Create dict with details on all parameter values.
@@ -87,6 +319,24 @@ class Processor(ABC):
                 vals.append(val)
         return vals
 
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @dtype.setter
+    def dtype(self, dtype):
+        """ Set the precision of the signal path, coefficients and state.
+
+        Changing the precision of a constructed processor
+        recomputes its coefficients and resets its state.
+
+        """
+        changed = hasattr(self, "_dtype") and self._dtype != np.dtype(dtype)
+        self._dtype = np.dtype(dtype)
+        if changed and self.parameters is not None:
+            self.update(None)
+            self.reset_state()
+
     @property
     def parameters(self):
         return self._parameters
@@ -1,11 +1,14 @@
+import copy
 import random
 
 class ProcessorList(object):
 
-    def __init__(self, block_size, sample_rate):
+    def __init__(self, block_size, sample_rate, dtype="float64"):
         self._processors = []
+        self._added = []  # processors in the order they were added
         self._block_size = block_size
         self._sample_rate = sample_rate
+        self._dtype = dtype
 
     def __repr__(self):
         for processor in self._processors:
@@ -14,12 +17,16 @@ class ProcessorList(object):
     def add(self, processor):
         self.check_processor(processor)
         self._processors.append(processor)
+        self._added.append(processor)
         self._processors[-1].block_size = self._block_size
         self._processors[-1].sample_rate = self._sample_rate
+        self._processors[-1].dtype = self._dtype
 
     def insert(self, processor, index):
         self.check_processor(processor)
         self._processors.insert(index, processor)
+        self._added.append(processor)
+        processor.dtype = self._dtype
 
     def swap(self, name_a, name_b):
         names = [processor.name for processor in self._processors]
@@ -32,7 +39,9 @@ class ProcessorList(object):
         self._processors[i], self._processors[j] = b, a
 
     def remove(self, name):
-        self._processors.remove(self.get(name))
+        processor = self.get(name)
+        self._processors.remove(processor)
+        self._added.remove(processor)
 
     def get(self, name):
         names = [processor.name for processor in self._processors]
@@ -48,7 +57,23 @@ class ProcessorList(object):
             raise ValueError("Processor names must be unique!")
 
     def shuffle(self):
+        """ Randomly order the processors.
+
+        The shuffle always starts from the order in which the processors
+        were added, so the result only depends on the state of `random`.
+
+        """
+        self._processors = list(self._added)
         random.shuffle(self._processors)
 
+    def clone(self):
+        """ Return a list with clones of all processors in the same order (see `Processor.clone()`). """
+        processor_list = copy.copy(self)
+        clones = {id(processor) : processor.clone() for processor in self._added}
+        processor_list._processors = [clones[id(processor)] for processor in self._processors]
+        processor_list._added      = [clones[id(processor)] for processor in self._added]
+        return processor_list
+
     def clear(self):
-        self._processors = []
\ No newline at end of file
+        self._processors = []
+        self._added = []
\ No newline at end of file
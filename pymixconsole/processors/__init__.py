@@ -1,9 +1,23 @@
-from .gain       import Gain
-from .inverter   import PolarityInverter
-from .panner     import Panner
-from .equaliser  import Equaliser
-from .algoreverb import AlgorithmicReverb
-from .delay      import Delay
-from .distortion import Distortion
-from .compressor import Compressor
-from .convreverb import ConvolutionalReverb
\ No newline at end of file
+import importlib
+
+# each processor (and its kernels and dependencies) is imported on first access
+_processors = {"Gain"                : "gain",
+               "PolarityInverter"    : "inverter",
+               "Panner"              : "panner",
+               "Equaliser"           : "equaliser",
+               "AlgorithmicReverb"   : "algoreverb",
+               "Delay"               : "delay",
+               "Distortion"          : "distortion",
+               "Compressor"          : "compressor",
+               "ConvolutionalReverb" : "convreverb"}
+
+__all__ = list(_processors)
+
+def __getattr__(name):
+    if name in _processors:
+        globals()[name] = getattr(importlib.import_module(f".{_processors[name]}", __name__), name)
+        return globals()[name]
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,13 +1,10 @@
-import scipy.signal
 import numpy as np
+from ..util.jit import jit
 
-from ..processor import Processor
+from ..processor import Processor, SILENCE_THRESHOLD
 from ..parameter import Parameter
 from ..parameter_list import ParameterList
 
-from ..components.allpass import Allpass
-from ..components.comb import Comb
-
 # Tuning
 muted        = 0.0
 fixedgain    = 0.015
@@ -19,7 +16,80 @@ offsetroom   = 0.7
 stereospread = 23
 scalegain    = 0.2
 
+# delay line lengths (optimized for fs=44.1kHz)
+combtuning    = [1116, 1188, 1277, 1356, 1422, 1491, 1557, 1617]
+allpasstuning = [556, 441, 341, 225]
+
+@jit(nopython=True, nogil=True, cache=True)
+def n_process(data, out, buffer, offsets, lengths, indices, filterstore, n_combs, n_allpasses,
+              feedback, damp1, damp2, allpass_feedback, wet1_g, wet2_g, dry_g):
+    """ Run the comb bank and allpass chain of both channels in a single pass.
+
+    All delay lines are packed into one `buffer`, where line `f` starts at `offsets[f]`,
+    has `lengths[f]` samples and its current position is `indices[f]`. Lines are ordered as
+    left combs, right combs, left allpasses, right allpasses.
+
+    Params
+    -------
+    data : ndarray
+        Input audio data. (samples, 2)
+    out : ndarray
+        Buffer to write the output into. (samples, 2)
+    """
+
+    wet = np.zeros(2)
+
+    for n in range(data.shape[0]):
+        for side in range(2):
+            x = data[n,side] * scalegain
+
+            # parallel bank of lowpass feedback comb filters
+            acc = 0.0
+            for k in range(n_combs):
+                f = side * n_combs + k
+                pos = offsets[f] + indices[f]
+
+                y = buffer[pos]
+                filterstore[f] = (y * damp2) + (filterstore[f] * damp1)
+                buffer[pos] = x + (filterstore[f] * feedback)
+                acc += y
+
+                indices[f] += 1
+                if indices[f] >= lengths[f]:
+                    indices[f] = 0
+
+            # series of allpass filters
+            for k in range(n_allpasses):
+                f = 2 * n_combs + side * n_allpasses + k
+                pos = offsets[f] + indices[f]
+
+                buffer_out = buffer[pos]
+                y = -acc + buffer_out
+                buffer[pos] = acc + (buffer_out * allpass_feedback)
+                acc = y
+
+                indices[f] += 1
+                if indices[f] >= lengths[f]:
+                    indices[f] = 0
+
+            wet[side] = acc
+
+        out[n,0] = (wet1_g * wet[0]) + (wet2_g * wet[1]) + (dry_g * data[n,0])
+        out[n,1] = (wet1_g * wet[1]) + (wet2_g * wet[0]) + (dry_g * data[n,1])
+
+    return out
+
 class AlgorithmicReverb(Processor):
+    """ Stereo algorithmic reverb based on Freeverb.
+
+    Each channel feeds a bank of eight lowpass feedback comb filters in parallel
+    followed by four allpass filters in series. The delay lines of all filters are
+    packed into one buffer and processed by a single compiled kernel. Changing the
+    parameters only updates the feedback and damping, so the reverb tail is kept.
+
+    """
+    state_attributes = ["_buffer", "_indices", "_filterstore", "_silent_samples"]
+
     def __init__(self, name="reverb", block_size=512, sample_rate=44100):
         super().__init__(name, None, block_size, sample_rate)
 
@@ -31,100 +101,69 @@ class AlgorithmicReverb(Processor):
         self.parameters.add(Parameter("wet_mix",     0.1, "float", processor=self, minimum=0.0,  maximum=1.0))
         self.parameters.add(Parameter("width",       0.7, "float", processor=self, minimum=0.0,  maximum=1.0))
 
+        ss = stereospread
+        self._lengths = np.array([length    for length in combtuning] +
+                                 [length+ss for length in combtuning] +
+                                 [length    for length in allpasstuning] +
+                                 [length+ss for length in allpasstuning])
+        self._offsets = np.concatenate(([0], np.cumsum(self._lengths)[:-1]))
+
+        self._output_buffer = np.zeros((self.block_size, 2), dtype=self.dtype)
+        self.reset_state()
         self.update(None)
 
     def process(self, data):
 
-        if data.ndim >= 2:
-            dataL = data[:,0]
-            if data.shape[1] == 2:
-                dataR = data[:,1]
-            else:
-                dataR = data[:,0]
-        else:
-            dataL = data
-            dataR = data
+        if data.ndim < 2 or data.shape[1] == 1: # view mono input as stereo without copying
+            data = np.broadcast_to(data.reshape(-1, 1), (data.shape[0], 2))
 
-        output = np.zeros((data.shape[0], 2))
+        if self._output_buffer.shape[0] != data.shape[0] or self._output_buffer.dtype != self.dtype:
+            self._output_buffer = np.zeros((data.shape[0], 2), dtype=self.dtype)
 
-        if self.parameters.bypass.value:
-            output[:,0] = dataL
-            output[:,1] = dataR
+        output = self._output_buffer
 
-        else:   
-            xL, xR = self.process_filters(dataL.copy(), dataR.copy())
+        if self.parameters.bypass.value:
+            output[:] = data
+        else:
+            self._count_silence(data)
 
-            wet1_g = self.parameters.wet_mix.value * ((self.parameters.width.value/2) + 0.5)
-            wet2_g = self.parameters.wet_mix.value * ((1-self.parameters.width.value)/2)
-            dry_g  = self.parameters.dry_mix.value
+            wet1_g = self.dtype.type(self.parameters.wet_mix.value * ((self.parameters.width.value/2) + 0.5))
+            wet2_g = self.dtype.type(self.parameters.wet_mix.value * ((1-self.parameters.width.value)/2))
+            dry_g  = self.dtype.type(self.parameters.dry_mix.value)
 
-            output[:,0] = (wet1_g * xL) + (wet2_g * xR) + (dry_g * dataL)
-            output[:,1] = (wet1_g * xR) + (wet2_g * xL) + (dry_g * dataR)
+            n_process(data, output, self._buffer, self._offsets, self._lengths, self._indices, self._filterstore,
+                      len(combtuning), len(allpasstuning), self._feedback, self._damp1, self._damp2,
+                      self._allpass_feedback, wet1_g, wet2_g, dry_g)
 
         return output
 
-    def process_filters(self, dataL, dataR):
-
-        xL  = self.combL1.process(dataL.copy() * scalegain)
-        xL += self.combL2.process(dataL.copy() * scalegain)
-        xL += self.combL3.process(dataL.copy() * scalegain)
-        xL += self.combL4.process(dataL.copy() * scalegain)
-        xL  = self.combL5.process(dataL.copy() * scalegain)
-        xL += self.combL6.process(dataL.copy() * scalegain)
-        xL += self.combL7.process(dataL.copy() * scalegain)
-        xL += self.combL8.process(dataL.copy() * scalegain)
-
-        xR  = self.combR1.process(dataR.copy() * scalegain)
-        xR += self.combR2.process(dataR.copy() * scalegain)
-        xR += self.combR3.process(dataR.copy() * scalegain)
-        xR += self.combR4.process(dataR.copy() * scalegain)
-        xR  = self.combR5.process(dataR.copy() * scalegain)
-        xR += self.combR6.process(dataR.copy() * scalegain)
-        xR += self.combR7.process(dataR.copy() * scalegain)
-        xR += self.combR8.process(dataR.copy() * scalegain)
-
-        yL1 = self.allpassL1.process(xL)
-        yL2 = self.allpassL2.process(yL1)
-        yL3 = self.allpassL3.process(yL2)
-        yL4 = self.allpassL4.process(yL3)
-
-        yR1 = self.allpassR1.process(xR)
-        yR2 = self.allpassR2.process(yR1)
-        yR3 = self.allpassR3.process(yR2)
-        yR4 = self.allpassR4.process(yR3)
-
-        return yL4, yR4
-
     def update(self, parameter_name):
-
-        rs = self.parameters.room_size.value
-        dp = self.parameters.damping.value
-        ss = stereospread
-
-        # initialize allpass and feedback comb-filters
-        # (with coefficients optimized for fs=44.1kHz)
-        self.allpassL1 = Allpass(556,    rs, self.block_size)
-        self.allpassR1 = Allpass(556+ss, rs, self.block_size)
-        self.allpassL2 = Allpass(441,    rs, self.block_size)
-        self.allpassR2 = Allpass(441+ss, rs, self.block_size)
-        self.allpassL3 = Allpass(341,    rs, self.block_size)
-        self.allpassR3 = Allpass(341+ss, rs, self.block_size)
-        self.allpassL4 = Allpass(225,    rs, self.block_size)
-        self.allpassR4 = Allpass(255+ss, rs, self.block_size)    
-
-        self.combL1 = Comb(1116,    dp, rs, self.block_size)
-        self.combR1 = Comb(1116+ss, dp, rs, self.block_size)
-        self.combL2 = Comb(1188,    dp, rs, self.block_size)
-        self.combR2 = Comb(1188+ss, dp, rs, self.block_size)
-        self.combL3 = Comb(1277,    dp, rs, self.block_size)
-        self.combR3 = Comb(1277+ss, dp, rs, self.block_size)
-        self.combL4 = Comb(1356,    dp, rs, self.block_size)
-        self.combR4 = Comb(1356+ss, dp, rs, self.block_size)
-        self.combL5 = Comb(1422,    dp, rs, self.block_size)
-        self.combR5 = Comb(1422+ss, dp, rs, self.block_size)
-        self.combL6 = Comb(1491,    dp, rs, self.block_size)
-        self.combR6 = Comb(1491+ss, dp, rs, self.block_size)
-        self.combL7 = Comb(1557,    dp, rs, self.block_size)
-        self.combR7 = Comb(1557+ss, dp, rs, self.block_size)
-        self.combL8 = Comb(1617,    dp, rs, self.block_size)
-        self.combR8 = Comb(1617+ss, dp, rs, self.block_size)
+        self._feedback = self.dtype.type(self.parameters.room_size.value)
+        self._damp1    = self.dtype.type(self.parameters.damping.value)
+        self._damp2    = self.dtype.type(1 - self.parameters.damping.value)
+        self._allpass_feedback = self.dtype.type(self.parameters.room_size.value)
+
+    @property
+    def tail_length(self):
+        """ Samples until the comb and allpass filters decay below the silence threshold for a full scale input. """
+        n_combs = len(combtuning)
+        n_cycles = int(np.ceil(np.log(SILENCE_THRESHOLD) / np.log(self.parameters.room_size.value)))
+        return n_cycles * (np.max(self._lengths[:2*n_combs]) + np.sum(self._lengths[-len(allpasstuning):]))
+
+    def is_idle(self):
+        if self.parameters.bypass.value or self._silent_samples == np.inf:
+            return True
+        # on silent input each comb and allpass adds at most the peak of the delay lines to the output
+        peak = max(np.max(np.abs(self._buffer)), np.max(np.abs(self._filterstore)))
+        return self._silent_samples > 0 and peak * (len(combtuning) + len(allpasstuning)) < SILENCE_THRESHOLD
+
+    def skip(self, num_samples):
+        super().skip(num_samples)
+        if not self.parameters.bypass.value and self._silent_samples != np.inf: # clear the decayed tail once
+            self.reset_state()
+
+    def reset_state(self):
+        self._buffer      = np.zeros(np.sum(self._lengths), dtype=self.dtype)
+        self._indices     = np.zeros(self._lengths.shape[0], dtype=np.int64)
+        self._filterstore = np.zeros(2 * len(combtuning), dtype=self.dtype)
+        self._silent_samples = np.inf
@@ -1,58 +1,177 @@
-from numba import jit
+from ..util.jit import jit
 import numpy as np
 
 from ..processor import Processor
 from ..parameter import Parameter
 from ..parameter_list import ParameterList
 
-@jit(nopython=True)
-def n_process(data, buffer, M, threshold, attack_time, release_time, ratio, makeup_gain, sample_rate, yL_prev):
+DETECTORS = ["linked", "unlinked"]
+GAIN_COMPUTERS = ["sample", "block"]
 
-    x_g = np.zeros(M)
-    x_l = np.zeros(M)
-    y_g = np.zeros(M)
-    y_l = np.zeros(M)
-    c   = np.zeros(M)
+@jit(nopython=True, nogil=True, cache=True)
+def gain_reduction(level, threshold, threshold_linear, ratio):
+    """ Static gain computer in dB for a linear input level.
 
-    alpha_attack  = np.exp(-1/(0.001 * sample_rate * attack_time))
-    alpha_release = np.exp(-1/(0.001 * sample_rate * release_time))
+    Levels below the threshold need no reduction, so the logarithm
+    is only evaluated for levels above it.
 
-    for i in np.arange(M):
-        if np.abs(buffer[i]) <  0.000001:
-            x_g[i] = -120.0
-        else:
-            x_g[i] = 20 * np.log10(np.abs(buffer[i]))
+    """
+    if level < 0.000001 or level < threshold_linear:
+        return 0.0
 
-        if x_g[i] >= threshold:
-            y_g[i] = threshold + (x_g[i] - threshold) / ratio
-        else:
-            y_g[i] = x_g[i]
-            
-        x_l[i] = x_g[i] - y_g[i]
+    x_g = 20 * np.log10(level)
 
-        if x_l[0] > yL_prev:
-            y_l[i] = alpha_attack * yL_prev + (1 - alpha_attack ) * x_l[i]
-        else:
-            y_l[i] = alpha_release * yL_prev + (1 - alpha_release) * x_l[i]
+    if x_g >= threshold:
+        return x_g - (threshold + (x_g - threshold) / ratio)
+    else:
+        return 0.0
+
+@jit(nopython=True, nogil=True, cache=True)
+def n_process(data, coefficients, linked, sub_block_size, yL_prev, gain_prev):
+    """ Apply compression to a mono or stereo signal in one pass.
+
+    Params
+    -------
+    data : ndarray
+        Input audio data, processed in place. (samples, signals)
+    coefficients : ndarray
+        [threshold, threshold_linear, ratio, makeup_gain, alpha_attack, alpha_release,
+         alpha_attack_block, alpha_release_block] as computed in `Compressor.update()`.
+    linked : bool
+        Use one detector on the mean of all signals (True) or one detector per signal.
+    sub_block_size : int
+        If larger than 1, the gain is computed once per sub-block of this size from the
+        peak level and linearly interpolated over the sub-block.
+    yL_prev : ndarray
+        Smoothed gain reduction in dB of each detector, updated in place. (signals,)
+    gain_prev : ndarray
+        Last linear gain of each detector, updated in place. (signals,)
+    """
+
+    M = data.shape[0]
+    n_signals = data.shape[1]
+    n_detectors = 1 if linked else n_signals
+
+    threshold, threshold_linear, ratio, makeup_gain = coefficients[0], coefficients[1], coefficients[2], coefficients[3]
+    alpha_attack, alpha_release = coefficients[4], coefficients[5]
+
+    # gain in dB to linear is computed as exp(gain * log(10)/20)
+    db = np.log(10.0) / 20.0
+
+    if sub_block_size <= 1:
+        for i in range(M):
+            for d in range(n_detectors):
+                if linked:
+                    if n_signals == 2:
+                        level = np.abs((data[i,0] + data[i,1]) * 0.5)
+                    else:
+                        level = np.abs(data[i,0])
+                else:
+                    level = np.abs(data[i,d])
+
+                x_l = gain_reduction(level, threshold, threshold_linear, ratio)
+
+                if x_l > yL_prev[d]:
+                    y_l = alpha_attack  * yL_prev[d] + (1 - alpha_attack ) * x_l
+                else:
+                    y_l = alpha_release * yL_prev[d] + (1 - alpha_release) * x_l
+                yL_prev[d] = y_l
 
-        c[i] = np.power(10.0, (makeup_gain - y_l[i]) / 20.0)
-        yL_prev = y_l[i]
+                c = np.exp((makeup_gain - y_l) * db)
+                gain_prev[d] = c
 
-    if False:
-        data[:,0] *= c
-        data[:,1] *= c
+                if linked:
+                    for s in range(n_signals):
+                        data[i,s] *= c
+                else:
+                    data[i,d] *= c
     else:
-        data *= c
+        for start in range(0, M, sub_block_size):
+            stop = min(start + sub_block_size, M)
+            n = stop - start
 
-    return data, yL_prev
+            if n == sub_block_size:
+                alpha_attack_block, alpha_release_block = coefficients[6], coefficients[7]
+            else:
+                alpha_attack_block, alpha_release_block = alpha_attack ** n, alpha_release ** n
+
+            for d in range(n_detectors):
+                # peak level of the detector signal over the sub-block
+                level = 0.0
+                for i in range(start, stop):
+                    if linked:
+                        if n_signals == 2:
+                            x = np.abs((data[i,0] + data[i,1]) * 0.5)
+                        else:
+                            x = np.abs(data[i,0])
+                    else:
+                        x = np.abs(data[i,d])
+                    if x > level:
+                        level = x
+
+                x_l = gain_reduction(level, threshold, threshold_linear, ratio)
+
+                if x_l > yL_prev[d]:
+                    y_l = alpha_attack_block  * yL_prev[d] + (1 - alpha_attack_block ) * x_l
+                else:
+                    y_l = alpha_release_block * yL_prev[d] + (1 - alpha_release_block) * x_l
+                yL_prev[d] = y_l
+
+                # interpolate from the previous gain to the gain at the end of this sub-block
+                c_start = gain_prev[d]
+                c_stop  = np.exp((makeup_gain - y_l) * db)
+                gain_prev[d] = c_stop
+
+                for i in range(start, stop):
+                    c = c_start + (c_stop - c_start) * (i - start + 1) / n
+                    if linked:
+                        for s in range(n_signals):
+                            data[i,s] *= c
+                    else:
+                        data[i,d] *= c
+
+    return data, yL_prev, gain_prev
+
+@jit(nopython=True, nogil=True, cache=True)
+def n_process_batch(data, active, coefficients, linked, sub_block_size, yL_prev, gain_prev):
+    """ Multichannel version of `n_process` with per-channel coefficients.
+
+    `data` has dimensions [samples, signals, channels] and is processed in place.
+    Only the channels listed in `active` are compressed. The coefficients have
+    dimensions [8, channels] and the states [signals, channels].
+
+    """
+    for ch in active:
+        n_process(data[:,:,ch], coefficients[:,ch], linked, sub_block_size, yL_prev[:,ch], gain_prev[:,ch])
+
+    return data, yL_prev, gain_prev
 
 class Compressor(Processor):
     """ Single band dynamic range compressor.
 
+    Stereo inputs are processed in one pass, either with a single detector
+    on the mean of both channels (`detector="linked"`) or with one detector per
+    channel (`detector="unlinked"`).
+
+    By default the gain is computed for every sample. With `gain_computer="block"`
+    it is computed once per `sub_block_size` samples from the peak level and linearly
+    interpolated in between, which skips most of the per-sample logarithms and exponentials.
+
     """
-    def __init__(self, name="Compressor", block_size=512, sample_rate=44100):
+    state_attributes = ["yL_prev", "gain_prev"]
+
+    def __init__(self, name="Compressor", block_size=512, sample_rate=44100, detector="linked", gain_computer="sample", sub_block_size=16):
         super().__init__(name, None, block_size, sample_rate)
 
+        if detector not in DETECTORS:
+            raise ValueError(f"Invalid detector {detector}. Must be one of {DETECTORS}.")
+        if gain_computer not in GAIN_COMPUTERS:
+            raise ValueError(f"Invalid gain computer {gain_computer}. Must be one of {GAIN_COMPUTERS}.")
+
+        self.detector = detector
+        self.gain_computer = gain_computer
+        self.sub_block_size = sub_block_size
+
         self.parameters = ParameterList()
         self.parameters.add(Parameter("threshold",      0.0, "float", units="dB", processor=self, minimum=-60.0, maximum=0.0))
         self.parameters.add(Parameter("attack_time",    2.0, "float", units="ms", processor=self, minimum=0.03,  maximum=30.0))
@@ -60,36 +179,108 @@ class Compressor(Processor):
         self.parameters.add(Parameter("ratio",          2.0, "float",             processor=self, minimum=1.0,   maximum=10.0))
         self.parameters.add(Parameter("makeup_gain",    0.0, "float", units="dB", processor=self, minimum=-12.0, maximum=12.0))
 
-        self.yL_prev = 0
+        self.update(None)
+        self.reset_state()
 
     def process(self, x):
 
         if not self.parameters.threshold.value == 0.0:
-            # if input is stereo create mono downmix buffer
-            if x.ndim == 2:
-                buffer = np.squeeze((x[:,0] + x[:,1])) * 0.5
-            else:
-                buffer = x
-
-            x, self.yL_prev = n_process(x,
-                        buffer, 
-                        x.shape[0],
-                        self.parameters.threshold.value, 
-                        self.parameters.attack_time.value,
-                        self.parameters.release_time.value,
-                        self.parameters.ratio.value,
-                        self.parameters.makeup_gain.value,
-                        self.sample_rate,
-                        self.yL_prev)
+            signals = x if x.ndim == 2 else x[:,np.newaxis]
+
+            n_process(signals,
+                      self._coefficients,
+                      self.detector == "linked",
+                      self._sub_block_size,
+                      self.yL_prev,
+                      self.gain_prev)
 
         else:
             if x.ndim < 2: # if input is mono (samples,) add stereo dim
-                x = np.expand_dims(x, 1)    
-        
-            if x.shape[1] == 1: # if input is mono copy L to R        
+                x = np.expand_dims(x, 1)
+
+            if x.shape[1] == 1: # if input is mono copy L to R
                 x = np.repeat(x, 2, axis=1)
 
         return x
 
+    @classmethod
+    def process_batch(cls, processors, data):
+
+        modes = set([(p.detector, p._sub_block_size) for p in processors])
+        if len(modes) > 1: # the batched kernel needs the same mode for all channels
+            return super().process_batch(processors, data)
+        detector, sub_block_size = modes.pop()
+
+        active = [idx for idx, p in enumerate(processors) if not p.parameters.threshold.value == 0.0]
+
+        if len(active) > 0:
+            output = data.copy()
+            signals = output if output.ndim == 3 else output[:,np.newaxis,:]
+            yL_prev   = np.stack([p.yL_prev   for p in processors], axis=-1)
+            gain_prev = np.stack([p.gain_prev for p in processors], axis=-1)
+
+            n_process_batch(signals,
+                            np.array(active),
+                            np.stack([p._coefficients for p in processors], axis=-1),
+                            detector == "linked",
+                            sub_block_size,
+                            yL_prev,
+                            gain_prev)
+
+            for idx in active:
+                processors[idx].yL_prev[:]   = yL_prev[:,idx]
+                processors[idx].gain_prev[:] = gain_prev[:,idx]
+        else:
+            output = data
+
+        return output
+
     def update(self, parameter_name):
-        self.yL_prev = 0
+        """ Compute the coefficients used by the kernel (in double precision) from the current parameters. """
+
+        threshold    = self.parameters.threshold.value
+        attack_time  = self.parameters.attack_time.value
+        release_time = self.parameters.release_time.value
+
+        alpha_attack  = np.exp(-1/(0.001 * self.sample_rate * attack_time))
+        alpha_release = np.exp(-1/(0.001 * self.sample_rate * release_time))
+
+        self._sub_block_size = self.sub_block_size if self.gain_computer == "block" else 1
+
+        self._coefficients = np.array([threshold,
+                                       self.db2linear(threshold),
+                                       self.parameters.ratio.value,
+                                       self.parameters.makeup_gain.value,
+                                       alpha_attack,
+                                       alpha_release,
+                                       alpha_attack  ** self._sub_block_size,
+                                       alpha_release ** self._sub_block_size], dtype=np.float64)
+
+    def skip(self, num_samples):
+        """ Release the detector analytically over `num_samples` of silence.
+
+        With a silent input the gain reduction decays by `alpha_release` per sample,
+        so the state after the silence is computed directly without running the kernel.
+
+        """
+        super().skip(num_samples)
+
+        if not self.parameters.threshold.value == 0.0:
+            self.yL_prev  *= self._coefficients[5] ** num_samples
+            self.gain_prev[:] = np.exp((self._coefficients[3] - self.yL_prev) * (np.log(10.0) / 20.0))
+
+    def reset_state(self):
+        # the detector stays in double precision in any dtype, since the release 
+        # smoothing (1 - alpha_release) is too small for float32 at long release times
+        self.yL_prev   = np.zeros(2)
+        self.gain_prev = np.full(2, self.db2linear(self.parameters.makeup_gain.value))
+
+    @property
+    def sample_rate(self):
+        return self._sample_rate
+
+    @sample_rate.setter
+    def sample_rate(self, sample_rate):
+        self._sample_rate = sample_rate
+        if self.parameters: # the smoothing coefficients depend on the sample rate
+            self.update(None)
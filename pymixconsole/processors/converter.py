@@ -26,7 +26,7 @@ class Converter(Processor):
                 self.log.warning(f"data already stereo. doing nothing...")
                 return data
 
-            output = np.empty((data.shape[0], 2))
+            output = np.empty((data.shape[0], 2), dtype=data.dtype)
             output[:,0] = data
             output[:,1] = data
 
@@ -36,7 +36,7 @@ class Converter(Processor):
                 self.log.warning(f"data already mono. doing nothing...")
                 return data
 
-            output = np.empty((data.shape[0], 1))
+            output = np.empty((data.shape[0], 1), dtype=data.dtype)
             output[:,0] = (data[:,0] + data[:,1]) * 0.5
 
         return output
@@ -1,43 +1,72 @@
 FFT_TYPE = "scipy"
 
-import os
-import pathlib
-import warnings
 import numpy as np
-import scipy.signal
-from scipy.io import wavfile
+from ..util.jit import jit
 
+from ..util import irbank
 from ..parameter import Parameter
 from ..processor import Processor
 from ..parameter_list import ParameterList
 
 if FFT_TYPE == "scipy": 
-    from scipy.fftpack import fft, ifft
+    from scipy.fft import rfft, irfft
 else:                   
-    from numpy.fft import fft, ifft
+    from numpy.fft import rfft, irfft
 
-# Impulse responses
-ir_dir = "irs"
-src = {"sm-room" : "small_room.wav",
-       "md-room" : "medium_room.wav",
-       "lg-room" : "large_room.wav",
-       "hall"    : "hall.wav",
-       "plate"   : "plate.wav"}
+# the decay is rounded to this many decimals before looking up the impulse, 
+# so that randomized decays share the cached impulses and spectra of `util.irbank`
+DECAY_DECIMALS = 2
+
+@jit(nopython=True, nogil=True, cache=True)
+def n_multiply_accumulate(fdl, spectra, out):
+    """ Sum the products of the delay line and the impulse partition spectra.
+
+    Params
+    -------
+    fdl : ndarray
+        Spectra of past input blocks, oldest first. (partitions, bins, channels)
+    spectra : ndarray
+        Impulse partition spectra, last partition first. (partitions, bins, channels)
+    out : ndarray
+        Buffer for the output spectrum. (bins, channels)
+    """
+
+    out[:] = 0.0
+
+    for k in range(spectra.shape[0]):
+        for f in range(spectra.shape[1]):
+            for ch in range(spectra.shape[2]):
+                out[f,ch] += fdl[k,f,ch] * spectra[k,f,ch]
+
+    return out
 
 class ConvolutionalReverb(Processor):
+    """ Stereo convolution reverb using a set of measured impulse responses.
+
+    Blocks of `block_size` samples are processed with a uniformly partitioned 
+    overlap-save convolution. The impulse is split into partitions of `block_size`
+    samples whose spectra are computed once in `update()`, and the spectra of past
+    input blocks are kept in a frequency-domain delay line, so each block costs
+    one small FFT and IFFT plus a multiply-accumulate over the partitions.
+    Impulses and their spectra are shared by all instances through `util.irbank`,
+    with the decay rounded to steps of 0.01 (see `DECAY_DECIMALS`).
+    Inputs of any other length (e.g. when rendering offline) are convolved 
+    in one shot, which leaves the processor in the same state.
+
+    """
+    state_attributes = ["_input", "_fdl", "_fdl_idx", "_silent_samples"]
+
     def __init__(self, name="reverb", parameters=None, block_size=512, sample_rate=44100):
 
         super().__init__(name, parameters, block_size, sample_rate)
 
         if not parameters:
             self.parameters = ParameterList()
-            self.parameters.add(Parameter("type", "sm-room", "string", processor=self, options=["sm-room", "md-room", "lg-room", "hall", "plate"]))
+            self.parameters.add(Parameter("type", "sm-room", "string", processor=self, options=list(irbank.src.keys())))
             self.parameters.add(Parameter("decay",      1.0,  "float", processor=self, minimum=0.1, maximum=1.0))
             self.parameters.add(Parameter("dry_mix",    1.0,  "float", processor=self, minimum=0.0, maximum=1.0))
             self.parameters.add(Parameter("wet_mix",    0.0,  "float", processor=self, minimum=0.0, maximum=1.0))
 
-        self.impulses = {}  # dict to store numpy array for each impulse response
-        self.load()         # load all impulses into the dict
         self.update("type") # pre-process current impulse ready for application
 
     def process(self, x):
@@ -52,75 +81,212 @@ class ConvolutionalReverb(Processor):
         if self.parameters.wet_mix.value == 0.0:
             return x
         else:
-            # perform partitioned convolution
-            y = scipy.signal.fftconvolve(x, self.h, axes=0, mode='full')
-
-            # pick out the previous overlap that will be added to output
-            overlap = self.overlap[:self.block_size]
-
-            # there may be some overlap left over we need to save again
-            eoverlap = self.overlap[self.block_size:]
-            if eoverlap.shape[0] == 0:
-                padsize = self.block_size - overlap.shape[0]
-                overlap = np.pad(overlap, ((0,padsize),(0,0)))
-                eoverlap = np.zeros((self.overlap.shape))
+            self._count_silence(x)
+
+            if x.shape[0] == self.block_size:
+                wet = self._process_partitioned(x)
             else:
-                padsize = self.overlap.shape[0] - eoverlap.shape[0]
-                eoverlap = np.pad(eoverlap, ((0,padsize),(0,0)))
-            
-            wet = y[:self.block_size] + overlap             # add the previous overlap to the output
-            dry = x[:self.block_size,:]                     # grab the dry signal
-            self.overlap = y[self.block_size:,:] + eoverlap # store the overlap for the next frame (with extra overlap)
+                wet = self._process_whole(x)
 
-            wet *= self.parameters.wet_mix.value        # apply gain to wet signal
-            dry *= self.parameters.dry_mix.value        # apply gain to input (dry) signal
-            out = wet + dry                             # mix wet and dry signals
+            # mix wet and dry signals
+            out = (wet * self.parameters.wet_mix.value) + (x * self.parameters.dry_mix.value)
 
             return out
 
-    def load(self):
+    def process_automated(self, x):
+        """ Process a block while following the curves set with `automate()`.
+
+        A new impulse (`type` and `decay`) is loaded once at the start of the block, 
+        since each change needs new partition spectra, while `dry_mix` and `wet_mix`
+        are applied per sample.
+
+        """
+        automation = self._automation
+        self._automation = {}
+
+        with self.deferred():
+            for parameter_name in ["type", "decay"]:
+                if parameter_name in automation:
+                    value = automation[parameter_name][0]
+                    value = value.item() if isinstance(value, np.generic) else value
+                    if getattr(self.parameters, parameter_name).value != value:
+                        getattr(self.parameters, parameter_name).value = value
+
+        if x.ndim < 2: # if input is mono (samples,) add stereo dim
+            x = np.expand_dims(x, 1)
+
+        if x.shape[1] == 1: # if input is mono copy L to R
+            x = np.repeat(x, 2, axis=1)
+
+        self._count_silence(x)
+
+        mix = {}
+        for parameter_name in ["dry_mix", "wet_mix"]:
+            if parameter_name in automation:
+                mix[parameter_name] = automation[parameter_name][:,np.newaxis]
+                getattr(self.parameters, parameter_name).value = float(automation[parameter_name][-1])
+            else:
+                mix[parameter_name] = getattr(self.parameters, parameter_name).value
+
+        if x.shape[0] == self.block_size:
+            wet = self._process_partitioned(x)
+        else:
+            wet = self._process_whole(x)
+
+        return (wet * mix["wet_mix"]) + (x * mix["dry_mix"])
+
+    def get_state(self):
+        state = super().get_state()
+        state["_fdl"] = state["_fdl"][:self._spectra.shape[0]] # the second half of the delay line is a copy
+        return state
+
+    def set_state(self, state):
+        P = self._spectra.shape[0]
+        if state["_fdl"].shape != self._fdl[:P].shape:
+            raise ValueError(f"State of {self.name} was captured with a different impulse or block size.")
 
-        # read all impulse responses from disk and store
-        for reverb in self.parameters.type.options:
-            curdir = pathlib.Path(__file__).parent.absolute()
-            filename = os.path.join(curdir, "..", ir_dir, src[reverb])
+        super().set_state({name : value for name, value in state.items() if name != "_fdl"})
+        self._fdl[:P] = state["_fdl"]
+        self._fdl[P:] = state["_fdl"]
 
-            sr, h = wavfile.read(filename)   # load the audio file for correct impulse response
+    def __getstate__(self):
+        # the impulse and its spectra are shared through the bank and not stored
+        state = self.__dict__.copy()
+        del state["h"], state["_spectra"]
+        state["_fdl"] = self._fdl[:self._spectra.shape[0]] # the second half of the delay line is a copy
+        return state
 
-            # check if the sample rate matches processor
-            if sr != self.sample_rate:
-                # for now we raise an error. but in the future we would want to automatically resample
-                raise RuntimeError(f"Sample rate of impulse {sr} must match sample rate of processor {self.sample_rate}")
+    def __setstate__(self, state):
+        ir_type, decay = state["_impulse"]
+        state["_fdl"] = np.concatenate((state["_fdl"], state["_fdl"]))
+        self.__dict__.update(state)
+        self.h = irbank.get_decayed_impulse(ir_type, decay, self.sample_rate, dtype=self.dtype)
+        self._spectra = irbank.get_partition_spectra(ir_type, decay, self.sample_rate, self.block_size, dtype=self.dtype)
 
-            h = h/32767                      # convert from 16 bit into to 32 bit float
-            h *= 0.125                       # perform additional scaling for headroom
-            self.impulses[reverb] = h.astype(self.dtype)        # store into dictionary
+    @property
+    def tail_length(self):
+        """ Samples until the input history has left the partitioned convolution. """
+        return (self._spectra.shape[0] + 1) * self.block_size
+
+    def is_idle(self):
+        return self.parameters.wet_mix.value == 0.0 or self._silent_samples >= self.tail_length
+
+    def skip(self, num_samples):
+        super().skip(num_samples)
+        if self.parameters.wet_mix.value != 0.0 and self._silent_samples != np.inf: # clear the tail once
+            self.reset_state()
+            self._silent_samples = np.inf
+
+    def _process_partitioned(self, x):
+        B = self.block_size
+        P = self._spectra.shape[0]
+
+        # slide the input window and store its spectrum in the delay line (twice, 
+        # so that the last P spectra are always in one contiguous slice)
+        self._input[:B] = self._input[B:]
+        self._input[B:] = x
+
+        self._fdl_idx = (self._fdl_idx + 1) % P
+        X = rfft(self._input, axis=0)
+        self._fdl[self._fdl_idx]   = X
+        self._fdl[self._fdl_idx+P] = X
+
+        Y = n_multiply_accumulate(self._fdl[self._fdl_idx+1:self._fdl_idx+1+P], self._spectra, self._output_spectrum)
+
+        # keep only the last block of the circular convolution (overlap-save)
+        return irfft(Y, n=2*B, axis=0)[B:]
+
+    def _process_whole(self, x):
+        B = self.block_size
+        P = self._spectra.shape[0]
+
+        import scipy.signal # (imported on first use, it is slow to import)
+
+        # recover the past input from the delay line and convolve it along with the new input
+        history = self._get_history()
+        y = scipy.signal.fftconvolve(np.concatenate((history, x)), self.h, axes=0, mode='full')
+        wet = y[history.shape[0]:history.shape[0]+x.shape[0]]
+
+        # rebuild the delay line from the most recent input
+        self._set_history(np.concatenate((history, x))[-(P+1)*B:])
+
+        return wet
+
+    def _get_history(self):
+        """ Return the last (partitions + 1) * block_size input samples. """
+        B = self.block_size
+        P = self._spectra.shape[0]
+
+        windows = irfft(self._fdl[self._fdl_idx+1:self._fdl_idx+1+P], n=2*B, axis=1)
+        return np.concatenate((windows[0,:B], windows[:,B:].reshape(P*B, -1)))
+
+    def _set_history(self, history):
+        """ Fill the delay line from the last (partitions + 1) * block_size input samples. """
+        B = self.block_size
+        P = self._spectra.shape[0]
+
+        windows = np.stack([history[k*B:(k+2)*B] for k in range(P)])
+        self._fdl[:P] = rfft(windows, axis=1)
+        self._fdl[P:] = self._fdl[:P]
+        self._fdl_idx = P - 1
+        self._input[:] = history[-2*B:]
 
     def update(self, parameter_name=None):
-        # this should be updated soon so we only update certain parts
-        # based on which parameters change
 
-        # load proper impulse from memory
-        self.h = self.impulses[self.parameters.type.value].copy()
+        if parameter_name in ["dry_mix", "wet_mix"]:
+            return # the mix levels are applied directly in process()
+
+        if parameter_name == "decay" and getattr(self, "_impulse", None) == (self.parameters.type.value, self.decay):
+            return # the rounded decay selects the same impulse
+
+        # keep the input history so the reverb tail continues with the new impulse
+        history = self._get_history() if hasattr(self, "_fdl") else None
 
-        # fade out the impulse based on the decay setting
-        fstart = int(self.parameters.decay.value * self.h.shape[0])
-        fstop  = np.min((self.h.shape[0], fstart + int(0.020*self.sample_rate))) # constant 50 ms fade out
-        flen   = fstop - fstart
+        # get the faded impulse and its spectra from the shared bank
+        self.h = irbank.get_decayed_impulse(self.parameters.type.value, 
+                                            self.decay, 
+                                            self.sample_rate,
+                                            dtype=self.dtype)
+        self._impulse = (self.parameters.type.value, self.decay)
 
-        # if there is a fade (i.e. decay < 1.0)
-        if flen > 0 and True:
-            fade = np.arange(flen, dtype=self.dtype)/flen # normalized set of indices
-            fade = np.power(0.1, (1-fade) * 5)            # fade gain values with 100 dB of atten
-            fade = np.expand_dims(fade, 1)                # add stereo dim
-            fade = np.repeat(fade, 2, axis=1)             # copy gain to stereo dim
-            self.h[fstart:fstop,:] *= fade                # apply fade
-            self.h = self.h[:fstop]                       # throw away faded samples
+        self.update_spectra() # partition the impulse and reset the delay line
 
-        self.reset_state() # set the internal buffer to zeros
+        if history is not None and history.shape[1] == self.h.shape[1]:
+            length = (self._spectra.shape[0] + 1) * self.block_size
+            history = history[-length:]
+            if history.shape[0] < length:
+                history = np.concatenate((np.zeros((length - history.shape[0], history.shape[1])), history))
+            self._set_history(history)
+
+    @property
+    def decay(self):
+        """ The decay of the impulse, rounded to `DECAY_DECIMALS` decimals. """
+        return round(self.parameters.decay.value, DECAY_DECIMALS)
+
+    def update_spectra(self):
+        self._spectra = irbank.get_partition_spectra(self.parameters.type.value, 
+                                                     self.decay, 
+                                                     self.sample_rate,
+                                                     self.block_size,
+                                                     dtype=self.dtype)
+
+        self.reset_state() # set the internal buffers to zeros
 
     def reset_state(self):
-        overlap_shape = self.h.shape[0] - 1                         # overlap buffer size 
-        overlap_init = np.zeros((overlap_shape,self.h.shape[1]))    # create buffer for the time-domain overlap signal
-        self.overlap = overlap_init.astype(self.dtype)              # store zero values input buffer
-        
\ No newline at end of file
+        B = self.block_size
+        P = self._spectra.shape[0]
+
+        self._input  = np.zeros((2*B, self.h.shape[1]), dtype=self.dtype)                  # current and previous input block
+        self._fdl    = np.zeros((2*P, B+1, self.h.shape[1]), dtype=self._spectra.dtype) # frequency-domain delay line
+        self._fdl_idx = P - 1                                                           # position of the latest spectrum
+        self._output_spectrum = np.zeros((B+1, self.h.shape[1]), dtype=self._spectra.dtype)
+
+    @property
+    def block_size(self):
+        return self._block_size
+    
+    @block_size.setter
+    def block_size(self, block_size):
+        self._block_size = block_size
+        if hasattr(self, "h"): # the partitions depend on the block size
+            self.update_spectra()
@@ -1,38 +1,124 @@
 
 import numpy as np
-from numba import jit, float64
+from ..util.jit import jit
 
 
 from ..parameter import Parameter
-from ..processor import Processor
+from ..processor import Processor, SILENCE_THRESHOLD
 from ..parameter_list import ParameterList
 
-@jit(nopython=True)
-def n_process(data, out, buffer, read_idx, write_idx, delay, feedback, dry_mix, wet_mix):
+@jit(nopython=True, nogil=True, cache=True)
+def n_process(data, out, buffer, write_idx, delay, feedback, dry_mix, wet_mix):
+    """ Apply a feedback delay with a constant (fractional) delay time.
+
+    Fractional delays linearly interpolate between the two nearest samples. When the
+    delay is at least the block length, the whole block reads samples written before
+    it, so it is processed in contiguous runs between the wrap points of the delay line.
+
+    Params
+    -------
+    data : ndarray
+        Input audio data. (samples, channels)
+    out : ndarray
+        Output buffer. (samples, channels)
+    buffer : ndarray
+        Circular delay line, updated in place. (length, channels)
+    write_idx : int
+        Position in the delay line of the next input sample.
+    delay : float
+        Delay time in samples (float64 in any precision), at least 1 and at most the delay line length minus 2.
+    """
 
     M = buffer.shape[0]
+    N = data.shape[0]
+    n_channels = data.shape[1]
+
+    d = int(delay)
+    frac = delay - d
+
+    if d >= N:
+        n = 0
+        while n < N:
+            read_idx = write_idx - d
+            if read_idx < 0:
+                read_idx += M
+
+            if read_idx == 0: # the sample before it is at the end of the line
+                run = 1
+                prev_idx = M - 1
+            else:
+                run = min(N - n, M - write_idx, M - read_idx)
+                prev_idx = read_idx - 1
+
+            for k in range(run):
+                for ch in range(n_channels):
+                    delayed = buffer[read_idx+k,ch] + frac * (buffer[prev_idx+k,ch] - buffer[read_idx+k,ch])
+                    in_sample = data[n+k,ch]
+                    out[n+k,ch] = dry_mix * in_sample + wet_mix * delayed
+                    buffer[write_idx+k,ch] = in_sample + feedback * delayed
+
+            n += run
+            write_idx += run
+            if write_idx >= M:
+                write_idx = 0
+    else:
+        for n in range(N):
+            r0 = write_idx - d
+            if r0 < 0:
+                r0 += M
+            r1 = r0 - 1 if r0 > 0 else M - 1
+
+            for ch in range(n_channels):
+                delayed = buffer[r0,ch] + frac * (buffer[r1,ch] - buffer[r0,ch])
+                in_sample = data[n,ch]
+                out[n,ch] = dry_mix * in_sample + wet_mix * delayed
+                buffer[write_idx,ch] = in_sample + feedback * delayed
+
+            write_idx += 1
+            if write_idx >= M:
+                write_idx = 0
+
+    return out, buffer, write_idx
+
+@jit(nopython=True, nogil=True, cache=True)
+def n_process_modulated(data, out, buffer, write_idx, delay, feedback, dry_mix, wet_mix):
+    """ Version of `n_process` with per-sample parameters, each an array with one value per sample. """
 
+    M = buffer.shape[0]
     n_channels = data.shape[1]
 
-    for n in np.arange(data.shape[0]):
-        for ch in np.arange(n_channels):
-            in_sample = data[n, ch]
-            out_sample = (dry_mix * in_sample + wet_mix * buffer[read_idx,ch])
-            buffer[write_idx,ch] = in_sample + (buffer[read_idx,ch] * feedback)
-            out[n,ch] = out_sample
+    for n in range(data.shape[0]):
+        d = int(delay[n])
+        frac = delay[n] - d
 
-        read_idx  += 1
-        write_idx += 1
+        r0 = write_idx - d
+        if r0 < 0:
+            r0 += M
+        r1 = r0 - 1 if r0 > 0 else M - 1
 
-        if (read_idx >= M):
-            read_idx = 0
+        for ch in range(n_channels):
+            delayed = buffer[r0,ch] + frac * (buffer[r1,ch] - buffer[r0,ch])
+            in_sample = data[n,ch]
+            out[n,ch] = dry_mix[n] * in_sample + wet_mix[n] * delayed
+            buffer[write_idx,ch] = in_sample + feedback[n] * delayed
 
-        if (write_idx >= M):
+        write_idx += 1
+        if write_idx >= M:
             write_idx = 0
 
-    return out, buffer, read_idx, write_idx
+    return out, buffer, write_idx
 
 class Delay(Processor):
+    """ Feedback delay with a fractional delay time.
+
+    The delay line is sized from the largest delay of the `delay` parameter and is
+    only reallocated on `reset()`, so changing the delay time (or modulating it per
+    sample with `automate()`) keeps the echoes in the line. Delays between samples
+    are linearly interpolated and delays below one sample are processed as one sample.
+
+    """
+    state_attributes = ["buffer", "write_idx", "_silent_samples"]
+
     def __init__(self, name="Delay", parameters=None, block_size=512, sample_rate=44100):
 
         super().__init__(name, parameters, block_size, sample_rate)
@@ -40,38 +126,112 @@ class Delay(Processor):
         if not parameters:
             self.parameters = ParameterList()
             self.parameters.add(Parameter("bypass", False, "bool",  processor=None, p=0.8))
-            self.parameters.add(Parameter("delay",   5000, "int",   processor=self, units="samples", minimum=0, maximum=sample_rate))
+            self.parameters.add(Parameter("delay",  5000.0, "float", processor=self, units="samples", minimum=0, maximum=sample_rate))
             self.parameters.add(Parameter("feedback", 0.3, "float", processor=self, units="samples", minimum=0, maximum=1.0))
             self.parameters.add(Parameter("dry_mix",  1.0, "float", processor=self, units="samples", minimum=0, maximum=1.0))
             self.parameters.add(Parameter("wet_mix",  0.0, "float", processor=self, units="samples", minimum=0, maximum=1.0))
 
-        self.buffer = np.zeros((65536, 2))
-        self.read_idx = 0
-        self.write_idx = self.parameters.delay.value
+        self.reset_state()
+
+        # buffer to hold the output (reused on each call)
+        self._output_buffer = np.zeros((block_size, 2), dtype=self.dtype)
 
     def process(self, data):
         if not self.parameters.bypass.value:
+            self._count_silence(data)
+            data, out = self._prepare(data)
 
-            out = np.zeros((data.shape[0], 2))
-
-            if data.ndim < 2:
-                data = np.expand_dims(data, axis=1)
-                data = np.repeat(data, 2, axis=1)
-
-            out, self.buffer, self.read_idx, self.write_idx = n_process(data, out,
-                                self.buffer, self.read_idx, self.write_idx,
-                                self.parameters.delay.value, self.parameters.feedback.value,
-                                self.parameters.dry_mix.value, self.parameters.wet_mix.value)
+            out, self.buffer, self.write_idx = n_process(data, out, self.buffer, self.write_idx,
+                                np.float64(min(max(self.parameters.delay.value, 1), self.buffer.shape[0] - 2)),
+                                self.dtype.type(self.parameters.feedback.value),
+                                self.dtype.type(self.parameters.dry_mix.value), self.dtype.type(self.parameters.wet_mix.value))
 
             return np.squeeze(out)
 
         else:
             return data
 
-    def update(self, parameterName):
-        self.reset()
+    def process_automated(self, data):
+        """ Follow the curves set with `automate()` per sample, e.g. to modulate the delay time. """
+        automation = self._automation
+        self._automation = {}
+
+        curves = {}
+        with self.deferred():
+            if "bypass" in automation:
+                self.parameters.bypass.value = bool(automation.pop("bypass")[0])
+            for name in ["delay", "feedback", "dry_mix", "wet_mix"]:
+                parameter = getattr(self.parameters, name)
+                # the delay time stays in double precision to place the read position exactly
+                dtype = np.float64 if name == "delay" else self.dtype
+                if name in automation:
+                    curves[name] = np.asarray(automation[name], dtype=dtype)
+                    parameter.value = float(curves[name][-1])
+                else:
+                    curves[name] = np.full(data.shape[0], parameter.value, dtype=dtype)
+
+        if self.parameters.bypass.value:
+            return data
+
+        self._count_silence(data)
+        data, out = self._prepare(data)
+
+        out, self.buffer, self.write_idx = n_process_modulated(data, out, self.buffer, self.write_idx,
+                            np.clip(curves["delay"], 1, self.buffer.shape[0] - 2), curves["feedback"], curves["dry_mix"], curves["wet_mix"])
+
+        return np.squeeze(out)
+
+    def _prepare(self, data):
+        """ Return the input as a stereo view and the output buffer for it. """
+        if self._output_buffer.shape[0] != data.shape[0] or self._output_buffer.dtype != self.dtype:
+            self._output_buffer = np.zeros((data.shape[0], 2), dtype=self.dtype)
+
+        if data.ndim < 2: # view mono input as stereo without copying
+            data = np.broadcast_to(np.expand_dims(data, axis=1), (data.shape[0], 2))
+
+        return data, self._output_buffer
+
+    def _buffer_length(self):
+        # room for the largest delay and the sample before it (for the interpolation)
+        return int(np.ceil(self.parameters.delay.max)) + 2
+
+    def update(self, parameter_name):
+        # the read position follows from the delay, so the delay line is kept as is,
+        # unless the maximum delay was raised beyond its length
+        if self.buffer.shape[0] < self._buffer_length():
+            history = np.roll(self.buffer, -self.write_idx, axis=0) # oldest sample first
+            self.buffer = np.zeros((self._buffer_length(), 2), dtype=self.dtype)
+            self.buffer[-history.shape[0]:] = history
+            self.write_idx = 0
+
+    @property
+    def tail_length(self):
+        """ Samples until the echoes of a full scale input decay below the silence threshold. """
+        delay    = max(self.parameters.delay.value, 1)
+        feedback = self.parameters.feedback.value
+
+        if feedback >= 1.0:
+            return np.inf
+        elif feedback <= 0.0:
+            return delay
+
+        return delay * (1 + int(np.ceil(np.log(SILENCE_THRESHOLD) / np.log(feedback))))
+
+    def is_idle(self):
+        if self.parameters.bypass.value or self._silent_samples == np.inf:
+            return True
+        # on silent input the output and the echoes written back are at most the peak of the delay line
+        return self._silent_samples > 0 and np.max(np.abs(self.buffer)) < SILENCE_THRESHOLD
+
+    def skip(self, num_samples):
+        super().skip(num_samples)
+        if not self.parameters.bypass.value and self._silent_samples != np.inf: # clear the decayed echoes once
+            self.reset_state()
 
     def reset(self):
-        self.read_idx = 0
-        self.write_idx = self.parameters.delay.value
-        self.buffer = np.zeros((65536, 2))
+        self.reset_state()
+
+    def reset_state(self):
+        self.write_idx = 0
+        self.buffer = np.zeros((self._buffer_length(), 2), dtype=self.dtype)
+        self._silent_samples = np.inf
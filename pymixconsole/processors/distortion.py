@@ -1,11 +1,11 @@
 import numpy as np
-from numba import jit, float64
+from ..util.jit import jit
 
 from ..parameter import Parameter
 from ..processor import Processor
 from ..parameter_list import ParameterList
 
-@jit(nopython=True)
+@jit(nopython=True, nogil=True, cache=True)
 def hard_clip(data, threshold_dB):
 
     M = data.shape[0]
@@ -19,7 +19,7 @@ def hard_clip(data, threshold_dB):
 
     return data
 
-@jit(nopython=True)
+@jit(nopython=True, nogil=True, cache=True)
 def soft_clip(data, factor):
     return data - (factor * np.power(data, 3))
 
@@ -40,9 +40,9 @@ class Distortion(Processor):
             if self.parameters.mode.value == "hard":
                 return hard_clip(data, self.parameters.threshold.value)
             if self.parameters.mode.value == "soft":
-                return soft_clip(data, self.parameters.factor.value)
+                return soft_clip(data, self.dtype.type(self.parameters.factor.value))
         else:
             return data
 
     def update(self, parameterName):
-        self.reset()
\ No newline at end of file
+        pass # parameters are read directly in process()
\ No newline at end of file
@@ -1,12 +1,93 @@
 import numpy as np
+from ..util.jit import jit
 
-from ..processor import Processor
+from ..processor import Processor, SILENCE_THRESHOLD
 from ..parameter import Parameter
 from ..parameter_list import ParameterList
 from ..components.iirfilter import IIRfilter
 
 BANDS = ["low_shelf", "first_band", "second_band", "third_band", "high_shelf"]
 
+@jit(nopython=True, nogil=True, cache=True)
+def n_process(data, sos, zi, passband_gain):
+    """ Apply a cascade of biquads to a mono or stereo signal in one pass.
+
+    Params
+    -------
+    data : ndarray
+        Input audio data, processed in place. (samples, signals)
+    sos : ndarray
+        Second-order sections with normalized coefficients [b0, b1, b2, a0, a1, a2]. (sections, 6)
+    zi : ndarray
+        Transposed direct form II filter state, updated in place. (sections, 2, signals)
+    passband_gain : ndarray
+        Gain applied at the output of each section. (sections,)
+    """
+
+    M = data.shape[0]
+    n_signals = data.shape[1]
+
+    for s in range(n_signals):
+        for sec in range(sos.shape[0]):
+            b0, b1, b2 = sos[sec,0], sos[sec,1], sos[sec,2]
+            a1, a2 = sos[sec,4], sos[sec,5]
+            g = passband_gain[sec]
+            z0, z1 = zi[sec,0,s], zi[sec,1,s]
+            for i in range(M):
+                x = data[i,s]
+                y = z0 + b0 * x
+                z0 = z1 + x * b1 - y * a1
+                z1 = x * b2 - y * a2
+                data[i,s] = g * y
+            zi[sec,0,s], zi[sec,1,s] = z0, z1
+
+    return data, zi
+
+@jit(nopython=True, nogil=True, cache=True)
+def n_process_batch(data, sos, zi, passband_gain):
+    """ Apply a cascade of biquads with per-channel coefficients.
+
+    Params
+    -------
+    data : ndarray
+        Input audio data, processed in place. (samples, signals, channels)
+    sos : ndarray
+        Second-order sections with normalized coefficients. (sections, 6, channels)
+    zi : ndarray
+        Transposed direct form II filter state, updated in place. (sections, 2, signals, channels)
+    passband_gain : ndarray
+        Gain applied at the output of each section. (sections, channels)
+    """
+
+    M = data.shape[0]
+    n_signals  = data.shape[1]
+    n_channels = data.shape[2]
+
+    # the coefficients and states of each section are copied to contiguous
+    # arrays, so the loop over the channels of a sample is vectorized
+    z0 = np.empty(n_channels, dtype=data.dtype)
+    z1 = np.empty(n_channels, dtype=data.dtype)
+
+    for sec in range(sos.shape[0]):
+        b0, b1, b2 = sos[sec,0].copy(), sos[sec,1].copy(), sos[sec,2].copy()
+        a1, a2 = sos[sec,4].copy(), sos[sec,5].copy()
+        g = passband_gain[sec].copy()
+        for s in range(n_signals):
+            z0[:] = zi[sec,0,s]
+            z1[:] = zi[sec,1,s]
+            for i in range(M):
+                row = data[i,s]
+                for ch in range(n_channels):
+                    x = row[ch]
+                    y = z0[ch] + b0[ch] * x
+                    z0[ch] = z1[ch] + x * b1[ch] - y * a1[ch]
+                    z1[ch] = x * b2[ch] - y * a2[ch]
+                    row[ch] = g[ch] * y
+            zi[sec,0,s] = z0
+            zi[sec,1,s] = z1
+
+    return data, zi
+
 class Equaliser(Processor):
     """ Five band parametreic equaliser ( two shelves and three central bands )
 
@@ -14,7 +95,14 @@ class Equaliser(Processor):
     This processor is implemented as cascade of five biquad IIR filters
     that are implemented using the infamous cookbook formulae from RBJ.
 
+    The coefficients of all bands are kept in one array of second-order 
+    sections and applied in a single compiled pass over the block, with the
+    filter state of both channels held in one contiguous array (mono inputs
+    use the state of the first channel).
+
     """
+    state_attributes = ["_zi"]
+
     def __init__(self, name="Equaliser", block_size=512, sample_rate=44100, gain_range=(-24,24), q_range=(0.1, 10.0), hard_clip=False):
         super().__init__(name, None, block_size, sample_rate)
 
@@ -46,6 +134,9 @@ class Equaliser(Processor):
         self.bands, self.filters = self.setup_filters()
         self.hard_clip = hard_clip
 
+        self.update(None)
+        self.reset_state()
+
     def setup_filters(self):
 
         filters = {}
@@ -69,12 +160,23 @@ class Equaliser(Processor):
 
     def update_filter(self, band):
 
-        self.filters[band].G    = getattr(self.parameters, band + "_gain").value
-        self.filters[band].fc   = getattr(self.parameters, band + "_freq").value
-        self.filters[band].rate = self.sample_rate 
-
         if band in ["first_band", "second_band", "third_band"]:
-            self.filters[band].Q    = getattr(self.parameters, band + "_q").value
+            Q = getattr(self.parameters, band + "_q").value
+        else:
+            Q = None
+
+        self.filters[band].set_parameters(G=getattr(self.parameters, band + "_gain").value,
+                                          Q=Q,
+                                          fc=getattr(self.parameters, band + "_freq").value,
+                                          rate=self.sample_rate)
+
+        self.update_sos(band) # the filter state is kept so changes do not click
+
+    def update_sos(self, band):
+        band_idx = BANDS.index(band)
+        self._sos[band_idx,:3] = self.filters[band].b
+        self._sos[band_idx,3:] = self.filters[band].a
+        self._passband_gain[band_idx] = self.filters[band].passband_gain
 
     def update(self, parameter_name=None):
 
@@ -82,21 +184,63 @@ class Equaliser(Processor):
             bands = ['_'.join(parameter_name.split('_')[:2])]
         else:
             bands = BANDS
+            # (re)allocate the coefficients in the processing precision
+            self._sos = np.zeros((len(BANDS), 6), dtype=self.dtype)
+            self._passband_gain = np.ones(len(BANDS), dtype=self.dtype)
 
         for band in bands:
             self.update_filter(band)
 
     def reset_state(self):
-        for band, iirfilter in self.filters.items():
-            iirfilter.reset_state()
+        self._zi = np.zeros((len(BANDS), 2, 2), dtype=self.dtype)
+
+    @property
+    def tail_length(self):
+        """ Samples for the slowest pole of the cascade to decay below the silence threshold. """
+        radius = np.max([np.max(np.abs(np.roots(section[3:]))) for section in self._sos])
+        if radius <= 0.0:
+            return 2
+        return int(np.ceil(np.log(SILENCE_THRESHOLD) / np.log(radius))) + 2
+
+    def is_idle(self):
+        return np.max(np.abs(self._zi)) < SILENCE_THRESHOLD
+
+    def skip(self, num_samples):
+        super().skip(num_samples)
+        self._zi[...] = 0.0
 
     def process(self, data):
 
-        for band, irrfilter in self.filters.items():
-            data = irrfilter.apply_filter(data)
+        output  = np.array(data, dtype=self.dtype)
+        signals = output if output.ndim == 2 else output[:,np.newaxis]
+
+        n_process(signals, self._sos, self._zi, self._passband_gain)
 
         if self.hard_clip:
-            data = np.clip(data, -1.0, 1.0)
+            np.clip(output, -1.0, 1.0, out=output)
+
+        return output
+
+    @classmethod
+    def process_batch(cls, processors, data):
+
+        output  = np.array(data, dtype=processors[0].dtype, order="C")
+        signals = output if output.ndim == 3 else output[:,np.newaxis,:]
+        n_signals  = signals.shape[1]
+        n_channels = signals.shape[2]
+
+        sos = np.stack([processor._sos for processor in processors], axis=-1)
+        passband_gain = np.stack([processor._passband_gain for processor in processors], axis=-1)
+        zi  = np.stack([processor._zi[:,:,:n_signals] for processor in processors], axis=-1)
+
+        n_process_batch(signals, sos, zi, passband_gain)
+
+        # store the updated state back in each processor
+        for ch_idx, processor in enumerate(processors):
+            processor._zi[:,:,:n_signals] = zi[...,ch_idx]
+
+            if processor.hard_clip:
+                np.clip(output[...,ch_idx], -1.0, 1.0, out=output[...,ch_idx])
 
-        return data
+        return output
 
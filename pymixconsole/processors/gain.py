@@ -1,10 +1,11 @@
-from numba import jit, float64
+import numpy as np
+from ..util.jit import jit
 
 from ..parameter import Parameter
 from ..processor import Processor
 from ..parameter_list import ParameterList
 
-@jit(nopython=True)
+@jit(nopython=True, nogil=True, cache=True)
 def n_process(data, gain):
     return gain * data
 
@@ -18,7 +19,23 @@ class Gain(Processor):
             self.parameters.add(Parameter("gain", 0.0, "float", processor=None, units="dB", minimum=-24.0, maximum=24.0))
 
     def process(self, data):
-        return n_process(data, self.db2linear(self.parameters.gain.value))
+        return n_process(data, self.dtype.type(self.db2linear(self.parameters.gain.value)))
+
+    def process_automated(self, data):
+        """ Apply the gain curve set with `automate()` per sample. """
+        gain = self._automation.pop("gain")
+        self.parameters.gain.value = float(gain[-1])
+        gains = self.db2linear(gain).astype(data.dtype)
+
+        if data.ndim > 1:
+            gains = gains[:,np.newaxis]
+
+        return data * gains
+
+    @classmethod
+    def process_batch(cls, processors, data):
+        gains = np.array([p.parameters.gain.value for p in processors])
+        return data * cls.db2linear(gains).astype(data.dtype)
 
     def update(self, parameter_name):
         pass
\ No newline at end of file
@@ -1,15 +1,16 @@
-from numba import jit, float64
+import numpy as np
+from ..util.jit import jit
 
 from ..parameter import Parameter
 from ..processor import Processor
 from ..parameter_list import ParameterList
 
-@jit(nopython=True)
+@jit(nopython=True, nogil=True, cache=True)
 def n_process(data, invert):
     if invert:
-        return -1.0 * data
+        return -data
     else:
-        return  1.0 * data
+        return  data.copy()
 
 class PolarityInverter(Processor):
     def __init__(self, name="Inverter", parameters=None, block_size=512, sample_rate=44100):
@@ -23,5 +24,10 @@ class PolarityInverter(Processor):
     def process(self, data):
         return n_process(data, self.parameters.invert.value)
 
+    @classmethod
+    def process_batch(cls, processors, data):
+        signs = np.array([-1.0 if p.parameters.invert.value else 1.0 for p in processors], dtype=data.dtype)
+        return signs * data
+
     def update(self, parameter_name):
         pass
@@ -1,18 +1,20 @@
-from numba import jit, float64
+from ..util.jit import jit
 import numpy as np
 
 from ..parameter import Parameter
 from ..processor import Processor
 from ..parameter_list import ParameterList
 
-@jit(nopython=True)
-def n_process(data, L, R):
+@jit(nopython=True, nogil=True, cache=True)
+def n_process(data, L, R, output_buffer):
     """ Apply panning gains based on chosen pan law.
 
     Params
     -------
     data : ndarrary
         Input audio data. (samples, channels)
+    output_buffer : ndarray
+        Buffer to write the panned audio into. (samples, 2)
 
     currently only support max of 2 channels
 
@@ -24,14 +26,41 @@ def n_process(data, L, R):
 
     if data.ndim < 2:
         # apply the channel gains
-        output_buffer_L = L * data
-        output_buffer_R = R * data
+        for n in range(data.shape[0]):
+            output_buffer[n,0] = L * data[n]
+            output_buffer[n,1] = R * data[n]
     else:
         # apply the channel gains
-        output_buffer_L = L * data[:,0]
-        output_buffer_R = R * data[:,1]
+        for n in range(data.shape[0]):
+            output_buffer[n,0] = L * data[n,0]
+            output_buffer[n,1] = R * data[n,1]
+
+    return output_buffer
+
+def pan_gains(pan, pan_law):
+    """ Left and right gains for a pan value (or an array of values).
+
+    The panning value is in the range [0, 1], where
+    0 means the signal is panned completely to the left, and
+    1 means the signal is apanned copletely to the right.
+    """
 
-    return output_buffer_L, output_buffer_R
+    # first scale the linear [0, 1] to [0, pi/2]
+    theta = pan * (np.pi/2)
+
+    if   pan_law == "linear":
+        L = ((np.pi/2) - theta) * (2/np.pi)
+        R = theta * (2/np.pi)
+    elif pan_law == "constant_power":
+        L = np.cos(theta)
+        R = np.sin(theta)
+    elif pan_law == "-4.5dB":
+        L = np.sqrt(((np.pi/2) - theta) * (2/np.pi) * np.cos(theta))
+        R = np.sqrt(theta * (2/np.pi) * np.sin(theta))
+    else:
+        raise ValueError(f"Invalid pan_law {pan_law}.")
+
+    return L, R
 
 class Panner(Processor):
     """ Simple stereo panner.
@@ -56,7 +85,7 @@ class Panner(Processor):
         self.update(None)
 
         # buffer to hold 
-        self._output_buffer = np.empty([self.block_size, 2])
+        self._output_buffer = np.empty([self.block_size, 2], dtype=self.dtype)
 
     def _calculate_pan_coefficents(self):
         """ Based on the set pan law deteremine the gain value
@@ -65,30 +94,53 @@ class Panner(Processor):
             This operates on the assumption that the input channel is mono.
             The output data will be stereo at the moment, but could be expnanded
             to a higher channel count format. 
+        """
+        L, R = pan_gains(self.parameters.pan.value, self.parameters.pan_law.value)
+        self._L, self._R = self.dtype.type(L), self.dtype.type(R)
+
+    def process(self, data):
+        """ Pan the input into the internal output buffer.
+
+        The returned array is reused on the next call,
+        so copy it if the output must be kept.
 
-            The panning value is in the range [0, 1], where
-            0 means the signal is panned completely to the left, and
-            1 means the signal is apanned copletely to the right.
         """
+        if self._output_buffer.shape[0] != data.shape[0] or self._output_buffer.dtype != self.dtype:
+            self._output_buffer = np.empty([data.shape[0], 2], dtype=self.dtype)
+
+        return n_process(data, self._L, self._R, self._output_buffer)
+
+    def process_automated(self, data):
+        """ Pan with the per-sample pan curve set with `automate()`. """
+        if "pan_law" in self._automation:
+            self.parameters.pan_law.value = self._automation.pop("pan_law")[0]
+
+        pan = self._automation.pop("pan", np.full(data.shape[0], self.parameters.pan.value))
+        self.parameters.pan.value = float(pan[-1])
+        L, R = pan_gains(pan, self.parameters.pan_law.value)
+
+        output = np.empty((data.shape[0], 2), dtype=self.dtype)
+        L, R = L.astype(self.dtype), R.astype(self.dtype)
+        output[:,0] = L * (data if data.ndim < 2 else data[:,0])
+        output[:,1] = R * (data if data.ndim < 2 else data[:,1])
 
-        # first scale the linear [0, 1] to [0, pi/2]
-        theta = self.parameters.pan.value * (np.pi/2)
-
-        if   self.parameters.pan_law.value == "linear":
-            self._L = ((np.pi/2) - theta) * (2/np.pi)
-            self._R = theta * (2/np.pi)
-        elif self.parameters.pan_law.value == "constant_power":
-            self._L = np.cos(theta)
-            self._R = np.sin(theta)
-        elif self.parameters.pan_law.value == "-4.5dB":
-            self._L = np.sqrt(((np.pi/2) - theta) * (2/np.pi) * np.cos(theta))
-            self._R = np.sqrt(theta * (2/np.pi) * np.sin(theta))
+        return output
+
+    @classmethod
+    def process_batch(cls, processors, data):
+        L = np.array([p._L for p in processors])
+        R = np.array([p._R for p in processors])
+
+        output = np.empty((data.shape[0], 2, data.shape[-1]), dtype=data.dtype)
+
+        if data.ndim < 3:
+            output[:,0,:] = L * data
+            output[:,1,:] = R * data
         else:
-            raise ValueError(f"Invalid pan_law {self.parameters.pan_law.value}.")
+            output[:,0,:] = L * data[:,0,:]
+            output[:,1,:] = R * data[:,1,:]
 
-    def process(self, data):
-        L, R = n_process(data, self._L, self._R)
-        return np.stack((L, R), axis=1)
+        return output
 
     def update(self, parameter_name):
         self._calculate_pan_coefficents()
@@ -100,4 +152,4 @@ class Panner(Processor):
     @block_size.setter
     def block_size(self, block_size):
         self._block_size = block_size
-        self._output_buffer = np.empty([block_size, 2])
\ No newline at end of file
+        self._output_buffer = np.empty([block_size, 2], dtype=self.dtype)
\ No newline at end of file
@@ -0,0 +1,156 @@
+""" Process-wide bank of impulse responses.
+
+Impulse responses are read from disk the first time a type is requested
+and then shared (read-only) by every `ConvolutionalReverb` in the process.
+Decayed impulses and their partition spectra are kept in bounded LRU caches,
+so creating or randomizing a reverb with settings that were already used
+does not repeat any work. The spectra of a decayed impulse reuse those of
+the full impulse up to the fade, so a new decay only needs a few FFTs.
+The cache sizes can be raised with `set_cache_size()`, e.g. to hold every
+type and decay used when randomizing reverbs.
+
+"""
+import os
+import pathlib
+import threading
+import functools
+import numpy as np
+
+# Impulse responses
+ir_dir = "irs"
+src = {"sm-room" : "small_room.wav",
+       "md-room" : "medium_room.wav",
+       "lg-room" : "large_room.wav",
+       "hall"    : "hall.wav",
+       "plate"   : "plate.wav"}
+
+DECAYED_CACHE_SIZE = 64 # number of decayed impulses to keep
+SPECTRA_CACHE_SIZE = 16 # number of partitioned spectra to keep
+
+_impulses = {}
+_lock = threading.Lock()
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+def get_impulse(ir_type, sample_rate, dtype="float64"):
+    """ Return the stereo impulse response of `ir_type`, loading it on first use.
+
+    The returned array is shared and must not be modified.
+
+    """
+    key = (ir_type, np.dtype(dtype).name)
+
+    with _lock:
+        if key not in _impulses:
+            curdir = pathlib.Path(__file__).parent.absolute()
+            filename = os.path.join(curdir, "..", ir_dir, src[ir_type])
+
+            from scipy.io import wavfile
+            sr, h = wavfile.read(filename)   # load the audio file for correct impulse response
+
+            h = h/32767                      # convert from 16 bit into to 32 bit float
+            h *= 0.125                       # perform additional scaling for headroom
+            _impulses[key] = (sr, _read_only(h.astype(dtype)))
+
+    sr, h = _impulses[key]
+
+    # check if the sample rate matches processor
+    if sr != sample_rate:
+        # for now we raise an error. but in the future we would want to automatically resample
+        raise RuntimeError(f"Sample rate of impulse {sr} must match sample rate of processor {sample_rate}")
+
+    return h
+
+def _fade(length, decay, sample_rate):
+    """ Return the first and last sample of the fade out of an impulse with `length` samples. """
+    fstart = int(decay * length)
+    fstop  = np.min((length, fstart + int(0.020*sample_rate))) # constant 50 ms fade out
+    return fstart, fstop
+
+def _get_decayed_impulse(ir_type, decay, sample_rate, dtype="float64"):
+    """ Return the impulse of `ir_type` faded out after `decay` of its length. """
+
+    h = get_impulse(ir_type, sample_rate, dtype=dtype)
+
+    # fade out the impulse based on the decay setting
+    fstart, fstop = _fade(h.shape[0], decay, sample_rate)
+    flen   = fstop - fstart
+
+    # if there is a fade (i.e. decay < 1.0)
+    if flen > 0:
+        fade = np.arange(flen, dtype=dtype)/flen    # normalized set of indices
+        fade = np.power(0.1, (1-fade) * 5)          # fade gain values with 100 dB of atten
+        fade = np.expand_dims(fade, 1)              # add stereo dim
+        h = h[:fstop].copy()                        # throw away faded samples
+        h[fstart:fstop,:] *= fade                   # apply fade
+        return _read_only(h)
+
+    return h
+
+def _spectra(h, block_size, dtype):
+    """ Return the spectra of `h` split into partitions, last partition first. """
+    from scipy.fft import rfft
+
+    B = block_size
+    P = int(np.ceil(h.shape[0] / B))
+
+    padded = np.zeros((P*B, h.shape[1]), dtype=dtype)
+    padded[:h.shape[0]] = h
+    partitions = np.zeros((P, 2*B, h.shape[1]), dtype=dtype)
+    partitions[:,:B] = padded.reshape(P, B, -1)
+
+    return rfft(partitions, axis=1)[::-1]
+
+def _get_partition_spectra(ir_type, decay, sample_rate, block_size, dtype="float64"):
+    """ Return the spectra of the decayed impulse split into `block_size` partitions.
+
+    Each partition is zero padded to twice the block size before the FFT.
+    The spectra are ordered last partition first with dimensions [partitions, bins, channels].
+
+    """
+    h = get_decayed_impulse(ir_type, decay, sample_rate, dtype=dtype)
+    length = get_impulse(ir_type, sample_rate, dtype=dtype).shape[0]
+
+    # the partitions before the fade are the same as those of the full impulse
+    K = _fade(length, decay, sample_rate)[0] // block_size
+    if h.shape[0] == length or K == 0:
+        return _read_only(_spectra(h, block_size, dtype).copy())
+
+    full = get_partition_spectra(ir_type, 1.0, sample_rate, block_size, dtype=dtype)
+    faded = _spectra(h[K*block_size:], block_size, dtype)
+
+    spectra = np.empty((faded.shape[0] + K,) + full.shape[1:], dtype=full.dtype)
+    spectra[:faded.shape[0]] = faded
+    spectra[faded.shape[0]:] = full[full.shape[0]-K:]
+
+    return _read_only(spectra)
+
+def set_cache_size(decayed=None, spectra=None):
+    """ Set the number of decayed impulses and of partitioned spectra to keep (this clears the caches).
+
+    Randomized reverbs draw from `len(src)` types and 91 decays (in steps of 0.01),
+    so `set_cache_size(spectra=len(src) * 91)` keeps the spectra of every setting
+    for one sample rate and block size, at the cost of a few hundred MB.
+
+    """
+    global get_decayed_impulse, get_partition_spectra, DECAYED_CACHE_SIZE, SPECTRA_CACHE_SIZE
+
+    if decayed is not None:
+        DECAYED_CACHE_SIZE = decayed
+    if spectra is not None:
+        SPECTRA_CACHE_SIZE = spectra
+
+    get_decayed_impulse   = functools.lru_cache(maxsize=DECAYED_CACHE_SIZE)(_get_decayed_impulse)
+    get_partition_spectra = functools.lru_cache(maxsize=SPECTRA_CACHE_SIZE)(_get_partition_spectra)
+
+get_decayed_impulse   = functools.lru_cache(maxsize=DECAYED_CACHE_SIZE)(_get_decayed_impulse)
+get_partition_spectra = functools.lru_cache(maxsize=SPECTRA_CACHE_SIZE)(_get_partition_spectra)
+
+def clear_cache():
+    """ Release all loaded impulses and cached spectra. """
+    with _lock:
+        _impulses.clear()
+    get_decayed_impulse.cache_clear()
+    get_partition_spectra.cache_clear()
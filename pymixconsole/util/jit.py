@@ -0,0 +1,57 @@
+""" Deferred numba compilation of the processing kernels.
+
+Importing numba (which also imports scipy) takes a few hundred milliseconds,
+so the kernels are decorated with this `jit` instead of `numba.jit`. It keeps
+the options and only hands the function to numba when a kernel is called for
+the first time. At that point numba is imported and every kernel in the
+module of that kernel is replaced by its numba dispatcher, so later calls
+(and calls between kernels in nopython mode) go to numba directly.
+
+Example
+>>> @jit(nopython=True, nogil=True, cache=True)
+... def n_process(data, gain):
+...     return gain * data
+
+"""
+import sys
+import threading
+import functools
+
+_lock = threading.RLock()
+
+class Kernel:
+    """ A function that is compiled with `numba.jit` on its first call. """
+
+    def __init__(self, py_func, options):
+        functools.update_wrapper(self, py_func)
+        self.py_func = py_func
+        self.options = options
+        self.dispatcher = None
+
+    def __call__(self, *args, **kwargs):
+        return self.compile()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"<deferred numba kernel {self.py_func.__module__}.{self.py_func.__name__}>"
+
+    def compile(self):
+        """ Return the numba dispatcher of the kernel, creating the dispatchers of its whole module. """
+        if self.dispatcher is None:
+            with _lock:
+                if self.dispatcher is None:
+                    import numba
+                    self.dispatcher = numba.jit(**self.options)(self.py_func)
+                    _resolve(sys.modules[self.py_func.__module__])
+        return self.dispatcher
+
+def _resolve(module):
+    """ Replace the deferred kernels in the namespace of `module` by their dispatchers. """
+    for name, value in list(vars(module).items()):
+        if isinstance(value, Kernel):
+            setattr(module, name, value.compile())
+
+def jit(**options):
+    """ Decorator with the options of `numba.jit` that defers the compilation (see above). """
+    def decorator(py_func):
+        return Kernel(py_func, options)
+    return decorator
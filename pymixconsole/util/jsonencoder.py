@@ -5,5 +5,9 @@ class CustomJSONEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, np.bool_):
             return super(CustomJSONEncoder, self).encode(bool(obj))
+        if isinstance(obj, np.integer):
+            return int(obj)
+        if isinstance(obj, np.floating):
+            return float(obj)
 
         return super(CustomJSONEncoder, self).default(obj)
\ No newline at end of file
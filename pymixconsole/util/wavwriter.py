@@ -0,0 +1,71 @@
+import struct
+import numpy as np
+
+class WavWriter():
+    """ Write a 32 bit float WAV file incrementally.
+
+    Frames are appended with `write()` and the sizes in the header
+    are filled in when the file is closed, so the length of the
+    audio does not need to be known in advance.
+
+    With `start` an existing file written by this class is continued
+    from that frame on, discarding any frames after it.
+
+    Example
+    >>> with WavWriter("mix.wav", 44100, num_channels=2) as writer:
+    ...     writer.write(block)
+
+    """
+    # size of the RIFF, format, fact and data chunk headers
+    HEADER_SIZE = 58
+
+    def __init__(self, path, rate, num_channels=2, start=None):
+        self.path = path
+        self.rate = rate
+        self.num_channels = num_channels
+        self.num_frames = 0
+
+        if start is None:
+            self._fp = open(path, "wb")
+            self._write_header()
+        else:
+            self._fp = open(path, "r+b")
+            self.num_frames = start
+            self._fp.seek(self.HEADER_SIZE + start * 4 * num_channels)
+            self._fp.truncate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, frames):
+        """ Append frames with dimensions [samples, channels]. """
+        frames = np.asarray(frames, dtype="<f4").reshape(-1, self.num_channels)
+        self._fp.write(np.ascontiguousarray(frames).tobytes())
+        self.num_frames += frames.shape[0]
+
+    def close(self):
+        if self._fp.closed:
+            return
+        self._fp.seek(0)
+        self._write_header()
+        self._fp.close()
+
+    def _write_header(self):
+        block_align = 4 * self.num_channels
+        data_size = self.num_frames * block_align
+
+        self._fp.write(b"RIFF")
+        self._fp.write(struct.pack("<I", 4 + 26 + 12 + 8 + data_size))
+        self._fp.write(b"WAVE")
+        # format chunk (3 = IEEE float)
+        self._fp.write(b"fmt ")
+        self._fp.write(struct.pack("<IHHIIHHH", 18, 3, self.num_channels, self.rate,
+                                   self.rate * block_align, block_align, 32, 0))
+        # number of frames (required for non-PCM formats)
+        self._fp.write(b"fact")
+        self._fp.write(struct.pack("<II", 4, self.num_frames))
+        self._fp.write(b"data")
+        self._fp.write(struct.pack("<I", data_size))
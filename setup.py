@@ -14,10 +14,10 @@ setup(name='pymixconsole',
       packages=find_packages(),
       package_data={'pymixconsole': ['irs/*.wav']},
       include_package_data=True,
-      install_requires=['scipy>=1.0.1',
+      install_requires=['scipy>=1.4.0',
                         'numpy>=1.14.2',
-                        'numba>=0.46.0',
-                        'graphviz>=0.13.2'],
+                        'numba>=0.46.0'],
+      extras_require={'diagram' : ['graphviz>=0.13.2']},
       classifiers=(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
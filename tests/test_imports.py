@@ -0,0 +1,37 @@
+import os
+import sys
+import json
+import subprocess
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# loose budgets in seconds, the tight ones are checked by `benchmarks/benchmark.py --only startup`
+STATEMENTS = {"import pymixconsole"                                         : 0.5,
+              "from pymixconsole.processors import Gain"                    : 2.0,
+              "from pymixconsole.processors import Gain, Equaliser, Panner" : 2.0}
+
+HEAVY_MODULES = ["numba", "scipy", "graphviz"]
+
+SCRIPT = """
+import sys, time, json
+start = time.perf_counter()
+{statement}
+print(json.dumps({{"import_s" : time.perf_counter() - start,
+                  "loaded"   : [name for name in {modules} if name in sys.modules]}}))
+"""
+
+def import_in_subprocess(statement):
+    output = subprocess.check_output([sys.executable, "-c", SCRIPT.format(statement=statement, modules=HEAVY_MODULES)], cwd=ROOT)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+@pytest.mark.parametrize("statement", list(STATEMENTS))
+def test_import_is_light(statement):
+    result = import_in_subprocess(statement)
+    assert result["loaded"] == []
+    assert result["import_s"] < STATEMENTS[statement]
+
+def test_console_import_does_not_load_graphviz():
+    result = import_in_subprocess("import pymixconsole as pymc; pymc.Console")
+    assert "graphviz" not in result["loaded"]
+    assert result["import_s"] < 5.0
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from pymixconsole.processors import ConvolutionalReverb
+from pymixconsole.util import irbank
+
+@pytest.fixture
+def cache():
+    irbank.set_cache_size(spectra=len(irbank.src) * 91)
+    yield
+    irbank.set_cache_size(spectra=16)
+
+@pytest.mark.parametrize("dtype", ["float64", "float32"])
+def test_partition_spectra_match_direct_computation(dtype):
+    for ir_type in irbank.src:
+        for decay in [0.1, 0.37, 0.99, 1.0]:
+            h = irbank.get_decayed_impulse(ir_type, decay, 44100, dtype=dtype)
+            spectra = irbank.get_partition_spectra(ir_type, decay, 44100, 512, dtype=dtype)
+            np.testing.assert_array_equal(spectra, irbank._spectra(h, 512, dtype))
+
+def test_repeated_randomize_hits_the_spectra_cache(cache):
+    reverb = ConvolutionalReverb(block_size=512)
+
+    np.random.seed(0)
+    for _ in range(50):
+        reverb.randomize()
+    first = irbank.get_partition_spectra.cache_info()
+
+    np.random.seed(0)
+    for _ in range(50):
+        reverb.randomize()
+    second = irbank.get_partition_spectra.cache_info()
+
+    assert second.misses == first.misses
+    assert second.hits >= first.hits + 50
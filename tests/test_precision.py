@@ -0,0 +1,29 @@
+import random
+import numpy as np
+import pytest
+
+import pymixconsole as pymc
+
+# largest deviation of the float32 output from float64, relative to its peak
+MAX_FLOAT32_ERROR_DB = -90.0
+
+def render(engine, dtype, x, block_size=512):
+    np.random.seed(0)
+    random.seed(0)
+    console = pymc.Console(block_size=block_size, num_channels=x.shape[1], engine=engine, dtype=dtype)
+    console.randomize()
+    console.busses[0].processors.get("delay").parameters.bypass.value = False
+
+    return np.concatenate([console.process_block(x[i:i+block_size]).copy() for i in range(0, x.shape[0], block_size)])
+
+@pytest.mark.parametrize("engine", pymc.console.ENGINES)
+@pytest.mark.parametrize("num_channels", [1, 8])
+def test_float32_deviation_from_float64(engine, num_channels):
+    x = (np.random.RandomState(0).rand(512 * 100, num_channels) * 2 - 1) * 0.5
+
+    reference = render(engine, "float64", x)
+    output = render(engine, "float32", x)
+
+    assert output.dtype == np.float32
+    error = np.max(np.abs(reference - output)) / np.max(np.abs(reference))
+    assert 20 * np.log10(error) < MAX_FLOAT32_ERROR_DB
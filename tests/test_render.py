@@ -0,0 +1,47 @@
+import random
+import numpy as np
+
+import pymixconsole as pymc
+
+def make_console(multitrack):
+    np.random.seed(0)
+    random.seed(0)
+    console = pymc.Console(multitrack=multitrack, num_channels=multitrack.num_channels)
+    console.randomize()
+    console.busses[1].processors.get("reverb").parameters.wet_mix.value = 0.5
+
+    # ramps evaluated per sample, per sub-block and once per block
+    console.automate(console.channels[0].post_processors.get("post-gain"), "gain", [0.0, 0.3], [-24.0, 0.0])
+    console.automate(console.channels[1].processors.get("eq"), "first_band_freq", [0.0, 0.2, 0.4], [400.0, 2000.0, 400.0])
+    console.automate(console.busses[1].processors.get("reverb"), "decay", [0.0, 0.4], [1.0, 0.2])
+    return console
+
+def test_render_with_automation_is_independent_of_chunk_size():
+    data = (np.random.RandomState(1).rand(512 * 40, 3) - 0.5) * 0.5
+    multitrack = pymc.Multitrack(data=data, num_channels=3, block_size=512)
+
+    reference = make_console(multitrack).render(multitrack, chunk_size=512)
+
+    for chunk_size in [4096, None]:
+        out = make_console(multitrack).render(multitrack, chunk_size=chunk_size)
+        np.testing.assert_allclose(out, reference, rtol=0, atol=1e-12)
+
+def test_render_with_automation_matches_block_processing():
+    data = (np.random.RandomState(1).rand(512 * 40, 3) - 0.5) * 0.5
+    multitrack = pymc.Multitrack(data=data, num_channels=3, block_size=512)
+
+    console = make_console(multitrack)
+    reference = np.concatenate([console.process_block(data[i:i+512]).copy() for i in range(0, data.shape[0], 512)])
+
+    out = make_console(multitrack).render(multitrack)
+    np.testing.assert_allclose(out, reference, rtol=0, atol=1e-12)
+
+def test_batch_render_with_automation_is_independent_of_chunk_size():
+    data = (np.random.RandomState(1).rand(512 * 40, 3) - 0.5) * 0.5
+    multitrack = pymc.Multitrack(data=data, num_channels=3, block_size=512)
+
+    reference = make_console(multitrack).render(multitrack, chunk_size=512)
+
+    batch = pymc.BatchConsole(make_console(multitrack), batch_size=2)
+    out = batch.render(multitrack, chunk_size=None)
+    np.testing.assert_allclose(out, np.stack([reference, reference]), rtol=0, atol=1e-12)
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from pymixconsole.processor import SILENCE_THRESHOLD
+from pymixconsole.processors import Delay, AlgorithmicReverb, ConvolutionalReverb
+
+def make_delay():
+    delay = Delay()
+    delay.parameters.delay.value = 3000.0
+    delay.parameters.feedback.value = 0.8
+    delay.parameters.wet_mix.value = 1.0
+    return delay
+
+def make_algoreverb():
+    reverb = AlgorithmicReverb()
+    reverb.parameters.room_size.value = 0.85
+    reverb.parameters.wet_mix.value = 1.0
+    return reverb
+
+def make_convreverb():
+    reverb = ConvolutionalReverb()
+    reverb.parameters.wet_mix.value = 1.0
+    return reverb
+
+@pytest.mark.parametrize("make_processor", [make_delay, make_algoreverb, make_convreverb])
+@pytest.mark.parametrize("gain", [1.0, 100.0])
+def test_skipping_keeps_the_tail_of_hot_inputs(make_processor, gain):
+    block_size = 512
+    burst = (np.random.RandomState(0).rand(block_size * 4, 2) - 0.5) * 2 * gain
+    silence = np.zeros((block_size, 2))
+
+    processed, skipped = make_processor(), make_processor()
+    for block in np.split(burst, 4):
+        processed.process(block.copy())
+        skipped.process(block.copy())
+
+    n_skipped = 0
+    for _ in range(800):
+        reference = np.array(processed.process(silence.copy()))
+        if skipped.is_idle():
+            skipped.skip(block_size)
+            output = np.zeros_like(reference)
+            n_skipped += 1
+        else:
+            output = np.array(skipped.process(silence.copy()))
+        assert np.max(np.abs(output - reference)) < SILENCE_THRESHOLD
+
+    assert n_skipped > 0